@@ -0,0 +1,396 @@
+from __future__ import annotations
+
+import datetime
+import json
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from dataclasses import dataclass
+
+from core.db import DataBase
+from core.favourites import get_favourite_locations
+from core.snapshot import ALL_CURRENT_FIELDS, DAILY_FIELDS
+from core.weather import Weather, request_forecasts
+
+ALERT_CURRENT_PARAMS = [
+    'temperature_2m',
+    'apparent_temperature',
+    'relative_humidity_2m',
+    'precipitation',
+    'weather_code',
+    'pressure_msl',
+    'wind_speed_10m',
+    'wind_direction_10m',
+    ]
+
+OPERATORS = ('<', '<=', '>', '>=', '==', '!=')
+ALERT_BATCH_SIZE = 50
+
+
+class RuleError(Exception):
+    """Класс, описывающий ошибку в описании правила оповещения."""
+    pass
+
+
+@dataclass(frozen=True)
+class Condition:
+    """Класс, описывающий условие над одной погодной переменной.
+
+    Attributes:
+        variable: Переменная Open-Meteo, например temperature_2m_max.
+        operator: Оператор сравнения из OPERATORS.
+        value: Пороговое значение.
+        horizon: None для текущих значений или номер дня прогноза.
+    """
+
+    variable: str
+    operator: str
+    value: float
+    horizon: int | None = None
+
+    def __post_init__(self) -> None:
+        if self.operator not in OPERATORS:
+            error_message = f'Неизвестный оператор: {self.operator}'
+            raise RuleError(error_message)
+
+
+def parse_condition(parts: Sequence[str]) -> Condition:
+    """Разбирает условие, заданное в командной строке.
+
+    Args:
+        parts: Переменная, оператор, значение и, для дневных переменных,
+            номер дня прогноза (0 - сегодня).
+
+    Returns:
+        Возвращает условие.
+    """
+    if len(parts) not in (3, 4):
+        error_message = ('Условие задаётся как ПЕРЕМЕННАЯ ОПЕРАТОР ЗНАЧЕНИЕ '
+                         '[ДЕНЬ]')
+        raise RuleError(error_message)
+
+    variable, operator, value = parts[:3]
+    horizon = parts[3] if len(parts) == 4 else None
+
+    if variable in ALL_CURRENT_FIELDS and horizon is not None:
+        error_message = f'Для текущей переменной {variable} день не задаётся'
+        raise RuleError(error_message)
+
+    if variable in DAILY_FIELDS and horizon is None:
+        error_message = f'Для дневной переменной {variable} нужен день'
+        raise RuleError(error_message)
+
+    if variable not in ALL_CURRENT_FIELDS and variable not in DAILY_FIELDS:
+        error_message = f'Неизвестная переменная: {variable}'
+        raise RuleError(error_message)
+
+    try:
+        return Condition(
+                variable=variable,
+                operator=operator,
+                value=float(value),
+                horizon=None if horizon is None else int(horizon),
+                )
+    except ValueError:
+        error_message = f'Некорректное число в условии: {" ".join(parts)}'
+        raise RuleError(error_message)
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    """Класс, описывающий правило оповещения.
+
+    Правило срабатывает для города, если выполнены все его условия.
+    """
+
+    id: int
+    name: str
+    phrase: str
+    conditions: tuple[Condition, ...]
+
+    @classmethod
+    def from_row(cls, row: tuple[int, str, str, str]) -> AlertRule:
+        """Создаёт правило из строки таблицы alert_rule.
+
+        Args:
+            row: Строка таблицы (id, name, phrase, conditions).
+
+        Returns:
+            Возвращает правило оповещения.
+        """
+        rule_id, name, phrase, conditions = row
+        return cls(
+                id=rule_id,
+                name=name,
+                phrase=phrase,
+                conditions=tuple(Condition(**condition)
+                                 for condition in json.loads(conditions)),
+                )
+
+
+@dataclass(frozen=True)
+class Alert:
+    """Класс, описывающий сработавшее для города правило."""
+
+    rule: AlertRule
+    city: str
+
+
+class AlertEngine:
+    """Класс, пакетно проверяющий правила для множества городов.
+
+    Для каждой пары (переменная, горизонт) значения всех городов один раз
+    сортируются, после чего каждое условие сводится к бинарному поиску
+    порога и срезу отсортированного столбца. Одинаковые условия разных
+    правил вычисляются один раз.
+    """
+
+    def __init__(self, rules: Iterable[AlertRule]) -> None:
+        """Устанавливает атрибуты для объекта AlertEngine.
+
+        Args:
+            rules: Правила оповещений.
+        """
+        self.__rules = list(rules)
+
+    def evaluate(
+            self,
+            values: Mapping[str, Mapping[tuple[str, int | None], float]],
+            ) -> list[Alert]:
+        """Проверяет все правила для всех городов.
+
+        Args:
+            values: Значения переменных по городам, как их возвращает
+                Weather.get_values.
+
+        Returns:
+            Возвращает список сработавших оповещений.
+        """
+        cities = list(values)
+        columns = self.__build_columns(cities, values)
+        selections = {}
+
+        alerts = []
+        for rule in self.__rules:
+            matched = None
+            for condition in rule.conditions:
+                key = (condition.variable, condition.horizon)
+                selection_key = (key, condition.operator, condition.value)
+                if selection_key not in selections:
+                    selections[selection_key] = self.__select(
+                            columns.get(key), condition)
+
+                selected = selections[selection_key]
+                matched = selected if matched is None else matched & selected
+
+                if not matched:
+                    break
+
+            for index in sorted(matched or ()):
+                alerts.append(Alert(rule=rule, city=cities[index]))
+
+        return alerts
+
+    def __build_columns(
+            self,
+            cities: list[str],
+            values: Mapping[str, Mapping[tuple[str, int | None], float]],
+            ) -> dict[tuple[str, int | None], tuple[list[float], list[int]]]:
+        """Строит отсортированные столбцы для используемых переменных.
+
+        Args:
+            cities: Города в порядке индексов.
+            values: Значения переменных по городам.
+
+        Returns:
+            Возвращает для каждой пары (переменная, горизонт) отсортированные
+            значения и соответствующие им индексы городов.
+        """
+        keys = {(condition.variable, condition.horizon)
+                for rule in self.__rules for condition in rule.conditions}
+
+        rows = [values[city] for city in cities]
+
+        columns = {}
+        for key in keys:
+            column = [city_values.get(key) for city_values in rows]
+            indexes = [index for index, value in enumerate(column)
+                       if value is not None]
+            indexes.sort(key=column.__getitem__)
+            columns[key] = ([column[index] for index in indexes], indexes)
+
+        return columns
+
+    @staticmethod
+    def __select(
+            column: tuple[list[float], list[int]] | None,
+            condition: Condition,
+            ) -> frozenset[int]:
+        """Выбирает индексы городов, удовлетворяющих условию.
+
+        Args:
+            column: Отсортированные значения и индексы городов.
+            condition: Условие.
+
+        Returns:
+            Возвращает множество индексов городов.
+        """
+        if column is None:
+            return frozenset()
+
+        sorted_values, indexes = column
+        left = bisect_left(sorted_values, condition.value)
+        right = bisect_right(sorted_values, condition.value)
+
+        if condition.operator == '<':
+            return frozenset(indexes[:left])
+
+        if condition.operator == '<=':
+            return frozenset(indexes[:right])
+
+        if condition.operator == '>':
+            return frozenset(indexes[right:])
+
+        if condition.operator == '>=':
+            return frozenset(indexes[left:])
+
+        if condition.operator == '==':
+            return frozenset(indexes[left:right])
+
+        return frozenset(indexes[:left] + indexes[right:])
+
+
+def load_alert_rules(database: DataBase) -> list[AlertRule]:
+    """Загружает правила оповещений из базы данных.
+
+    Args:
+        database: База данных.
+
+    Returns:
+        Возвращает список правил.
+    """
+    return [AlertRule.from_row(row)
+            for row in database.get_all_alert_rules()]
+
+
+def save_alert_rule(
+        database: DataBase,
+        name: str,
+        phrase: str,
+        conditions: Iterable[Condition],
+        ) -> None:
+    """Сохраняет правило оповещения в базу данных.
+
+    Args:
+        database: База данных.
+        name: Уникальное название правила.
+        phrase: Фраза, которая показывается при срабатывании.
+        conditions: Условия правила.
+    """
+    serialized = json.dumps([
+        {
+            'variable': condition.variable,
+            'operator': condition.operator,
+            'value': condition.value,
+            'horizon': condition.horizon,
+            }
+        for condition in conditions
+        ])
+    database.add_alert_rule(name, phrase, serialized)
+
+
+def filter_new_alerts(database: DataBase, alerts: list[Alert]) -> list[Alert]:
+    """Отбрасывает оповещения, уже показанные сегодня, и запоминает новые.
+
+    Args:
+        database: База данных.
+        alerts: Сработавшие оповещения.
+
+    Returns:
+        Возвращает оповещения, которые ещё не показывались сегодня.
+    """
+    day = datetime.date.today().isoformat()
+    sent = database.get_alert_notifications(day)
+
+    new_alerts = [alert for alert in alerts
+                  if (alert.rule.id, alert.city) not in sent]
+    database.add_alert_notifications(
+            [(alert.rule.id, alert.city, day) for alert in new_alerts])
+    return new_alerts
+
+
+def collect_favourite_values(
+        database: DataBase,
+        batch_size: int = ALERT_BATCH_SIZE,
+        should_stop: Callable[[], bool] | None = None,
+        ) -> dict[str, dict[tuple[str, int | None], float]]:
+    """Получает значения погодных переменных для любимых городов.
+
+    Координаты городов берутся из базы данных, прогнозы - из общего кэша,
+    а недостающие запрашиваются пачками по batch_size точек за запрос.
+    Города пачки, для которой сервер не ответил, пропускаются.
+
+    Args:
+        database: База данных.
+        batch_size: Количество точек в одном запросе.
+        should_stop: Функция, возвращающая True, если работу нужно
+            прервать. Она проверяется между запросами, и тогда
+            возвращаются уже полученные значения.
+
+    Returns:
+        Возвращает значения переменных по городам, как их возвращает
+        Weather.get_values.
+    """
+    locations = get_favourite_locations(database, should_stop=should_stop)
+
+    values = {}
+    for start in range(0, len(locations), batch_size):
+        if should_stop is not None and should_stop():
+            break
+
+        batch = locations[start:start + batch_size]
+
+        try:
+            snapshots = request_forecasts(
+                    [(latitude, longitude)
+                     for _, latitude, longitude in batch])
+        except Weather.ServerError:
+            continue
+
+        for (name, _, _), snapshot in zip(batch, snapshots):
+            values[name] = snapshot.get_values()
+
+    return values
+
+
+def check_favourite_alerts(
+        database: DataBase,
+        values: (Mapping[str, Mapping[tuple[str, int | None], float]]
+                 | None) = None,
+        should_stop: Callable[[], bool] | None = None,
+        ) -> list[Alert]:
+    """Проверяет правила для любимых городов и отбирает новые оповещения.
+
+    Args:
+        database: База данных.
+        values: Уже известные значения переменных по городам, например
+            для показанного города, или None.
+        should_stop: Функция, возвращающая True, если работу нужно
+            прервать. Прерванная проверка не возвращает оповещений и не
+            отмечает их показанными.
+
+    Returns:
+        Возвращает оповещения, которые ещё не показывались сегодня.
+    """
+    rules = load_alert_rules(database)
+
+    if not rules:
+        return []
+
+    city_values = collect_favourite_values(database,
+                                           should_stop=should_stop)
+    if should_stop is not None and should_stop():
+        return []
+
+    city_values.update(values or {})
+    alerts = AlertEngine(rules).evaluate(city_values)
+    return filter_new_alerts(database, alerts)
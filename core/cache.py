@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+class TTLCache:
+    """Класс, описывающий потокобезопасный кэш с ограниченным сроком жизни.
+
+    При переполнении вытесняются давно не использованные записи. Метод
+    get_or_load гарантирует, что при одновременных промахах по одному ключу
+    загрузка выполнится только один раз.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10000) -> None:
+        """Устанавливает атрибуты для объекта TTLCache.
+
+        Args:
+            ttl: Срок жизни записи в секундах.
+            maxsize: Максимальное количество записей.
+        """
+        self.__ttl = ttl
+        self.__maxsize = maxsize
+        self.__items: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.__loading: dict[Hashable, threading.Lock] = {}
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.__items)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Получает значение из кэша.
+
+        Args:
+            key: Ключ.
+            default: Значение, если ключа нет или срок его жизни истёк.
+
+        Returns:
+            Возвращает сохранённое значение или default.
+        """
+        with self.__lock:
+            item = self.__items.get(key)
+
+            if item is None or item[0] < time.monotonic():
+                self.misses += 1
+                return default
+
+            self.__items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any,
+            ttl: float | None = None) -> None:
+        """Сохраняет значение в кэш.
+
+        Args:
+            key: Ключ.
+            value: Значение.
+            ttl: Срок жизни записи в секундах, по умолчанию общий.
+        """
+        if ttl is None:
+            ttl = self.__ttl
+
+        with self.__lock:
+            self.__items[key] = (time.monotonic() + ttl, value)
+            self.__items.move_to_end(key)
+
+            while len(self.__items) > self.__maxsize:
+                self.__items.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any],
+                    with_ttl: bool = False) -> Any:
+        """Получает значение из кэша, а при промахе загружает его.
+
+        Args:
+            key: Ключ.
+            loader: Функция, загружающая значение.
+            with_ttl: Возвращает ли loader пару (значение, срок жизни
+                записи в секундах) вместо значения. Значение со сроком
+                жизни None живёт общий срок, а со сроком не больше нуля
+                не сохраняется.
+
+        Returns:
+            Возвращает сохранённое или загруженное значение.
+        """
+        missing = object()
+        value = self.get(key, missing)
+
+        if value is not missing:
+            return value
+
+        with self.__lock:
+            key_lock = self.__loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            try:
+                value = self.get(key, missing)
+
+                if value is missing:
+                    ttl = None
+                    value = loader()
+
+                    if with_ttl:
+                        value, ttl = value
+
+                    if ttl is None or ttl > 0:
+                        self.set(key, value, ttl)
+            finally:
+                with self.__lock:
+                    self.__loading.pop(key, None)
+
+        return value
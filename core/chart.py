@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import datetime
+import functools
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+
+from core.snapshot import WeatherSnapshot
+
+
+@dataclass(frozen=True)
+class ChartLine:
+    """Класс, описывающий одну линию графика.
+
+    Attributes:
+        label: Подпись линии.
+        xs: Моменты времени в секундах, местное время как UTC.
+        ys: Значения. Пропуски исходного ряда отброшены.
+    """
+
+    label: str
+    xs: tuple[float, ...]
+    ys: tuple[float, ...]
+
+
+@dataclass(frozen=True)
+class ChartPanel:
+    """Класс, описывающий панель графика с общей осью значений.
+
+    Attributes:
+        title: Заголовок панели.
+        unit: Единица измерения.
+        lines: Линии панели.
+    """
+
+    title: str
+    unit: str
+    lines: tuple[ChartLine, ...]
+
+
+@functools.lru_cache(maxsize=64)
+def parse_times(times: tuple[str, ...]) -> tuple[float, ...]:
+    """Переводит моменты времени Open-Meteo в секунды.
+
+    У городов одного часового пояса одинаковые ряды времени, поэтому
+    результат кэшируется.
+
+    Args:
+        times: Даты или дата и время в формате ISO 8601.
+
+    Returns:
+        Возвращает секунды с начала эпохи, местное время как UTC.
+    """
+    return tuple(
+            datetime.datetime.fromisoformat(time).replace(
+                tzinfo=datetime.timezone.utc).timestamp()
+            for time in times)
+
+
+def get_line(label: str, times: tuple[str, ...],
+             values: Sequence[float | None]) -> ChartLine:
+    """Строит линию графика из ряда Open-Meteo.
+
+    Args:
+        label: Подпись линии.
+        times: Моменты времени ряда.
+        values: Значения ряда.
+
+    Returns:
+        Возвращает линию без пропущенных значений.
+    """
+    points = [(x, y) for x, y in zip(parse_times(times), values)
+              if y is not None]
+    return ChartLine(label=label,
+                     xs=tuple(x for x, _ in points),
+                     ys=tuple(y for _, y in points))
+
+
+def get_hourly_panels(
+        snapshots: Mapping[str, WeatherSnapshot],
+        ) -> list[ChartPanel]:
+    """Строит панели почасового прогноза.
+
+    Args:
+        snapshots: Снимки погоды по городам.
+
+    Returns:
+        Возвращает панели температуры, осадков и скорости ветра.
+    """
+    def get_lines(name: str) -> tuple[ChartLine, ...]:
+        return tuple(get_line(city, snapshot.hourly_time,
+                              getattr(snapshot, f'hourly_{name}'))
+                     for city, snapshot in snapshots.items())
+
+    return [
+        ChartPanel('Температура', '°C', get_lines('temperature_2m')),
+        ChartPanel('Осадки', 'мм', get_lines('precipitation')),
+        ChartPanel('Скорость ветра', 'м/с', get_lines('wind_speed_10m')),
+        ]
+
+
+def get_daily_panels(
+        snapshots: Mapping[str, WeatherSnapshot],
+        ) -> list[ChartPanel]:
+    """Строит панели дневного прогноза.
+
+    Args:
+        snapshots: Снимки погоды по городам.
+
+    Returns:
+        Возвращает панели максимальной и минимальной температуры, суммы
+        осадков и максимальной скорости ветра.
+    """
+    temperature = []
+    precipitation = []
+    wind_speed = []
+    for city, snapshot in snapshots.items():
+        times = snapshot.daily_time
+        temperature.append(get_line(f'{city}, макс.', times,
+                                    snapshot.daily_temperature_2m_max))
+        temperature.append(get_line(f'{city}, мин.', times,
+                                    snapshot.daily_temperature_2m_min))
+        precipitation.append(get_line(city, times,
+                                      snapshot.daily_precipitation_sum))
+        wind_speed.append(get_line(city, times,
+                                   snapshot.daily_wind_speed_10m_max))
+
+    return [
+        ChartPanel('Температура', '°C', tuple(temperature)),
+        ChartPanel('Осадки', 'мм', tuple(precipitation)),
+        ChartPanel('Скорость ветра', 'м/с', tuple(wind_speed)),
+        ]
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float],
+         threshold: int) -> list[int]:
+    """Прореживает ряд алгоритмом Largest-Triangle-Three-Buckets.
+
+    Ряд делится на threshold - 2 корзины, из каждой выбирается точка,
+    образующая треугольник наибольшей площади с выбранной точкой
+    предыдущей корзины и средней точкой следующей. Первая и последняя
+    точки сохраняются всегда. В отличие от выбора каждой n-й точки,
+    сохраняет пики и форму ряда.
+
+    Args:
+        xs: Координаты точек по возрастанию.
+        ys: Значения точек.
+        threshold: Сколько точек оставить, обычно ширина графика в
+            пикселях.
+
+    Returns:
+        Возвращает индексы выбранных точек по возрастанию.
+    """
+    size = len(xs)
+
+    if threshold >= size:
+        return list(range(size))
+
+    if threshold < 3:
+        return [0, size - 1][:max(threshold, 0)]
+
+    bucket_size = (size - 2) / (threshold - 2)
+    indexes = [0]
+    selected = 0
+
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, size)
+
+        average_x = sum(xs[end:next_end]) / (next_end - end)
+        average_y = sum(ys[end:next_end]) / (next_end - end)
+        selected_x = xs[selected]
+        selected_y = ys[selected]
+
+        largest_area = -1.0
+        for index in range(start, end):
+            area = abs((selected_x - average_x) * (ys[index] - selected_y)
+                       - (selected_x - xs[index]) * (average_y - selected_y))
+            if area > largest_area:
+                largest_area = area
+                selected = index
+
+        indexes.append(selected)
+
+    indexes.append(size - 1)
+    return indexes
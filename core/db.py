@@ -1,16 +1,26 @@
 from __future__ import annotations
 
 import sqlite3
+from collections.abc import Iterator
 
 
 class DataBase:
-    def __init__(self) -> None:
-        self.__connection = sqlite3.connect('db.sql')
+    def __init__(self, path: str = 'db.sql') -> None:
+        self.__connection = sqlite3.connect(path)
         self.__cursor = self.__connection.cursor()
+        # Журнал WAL позволяет читать базу, пока её пишут другие процессы.
+        self.__cursor.execute('PRAGMA journal_mode=WAL')
 
         self._create_favourite_city_table()
         self._create_last_used_city_table()
         self._create_favourite_weather_table()
+        self._create_alert_rule_table()
+        self._create_alert_notification_table()
+        self._create_city_location_table()
+        self._create_forecast_cache_table()
+        self._create_weather_history_table()
+        self._create_forecast_change_table()
+        self._create_unknown_city_table()
 
     def _create_favourite_city_table(self) -> None:
         self.__cursor.execute("""
@@ -40,6 +50,100 @@ class DataBase:
         """)
         self.__connection.commit()
 
+    def _create_alert_rule_table(self) -> None:
+        self.__cursor.execute("""
+        CREATE TABLE IF NOT EXISTS alert_rule (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            phrase TEXT NOT NULL,
+            conditions TEXT NOT NULL
+        )
+        """)
+        self.__connection.commit()
+
+    def _create_alert_notification_table(self) -> None:
+        self.__cursor.execute("""
+        CREATE TABLE IF NOT EXISTS alert_notification (
+            rule_id INTEGER NOT NULL,
+            city TEXT NOT NULL,
+            day TEXT NOT NULL,
+            PRIMARY KEY (rule_id, city, day)
+        ) WITHOUT ROWID
+        """)
+        self.__connection.commit()
+
+    def _create_city_location_table(self) -> None:
+        self.__cursor.execute("""
+        CREATE TABLE IF NOT EXISTS city_location (
+            name TEXT PRIMARY KEY,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL
+        )
+        """)
+        self.__connection.commit()
+
+    def _create_forecast_cache_table(self) -> None:
+        # Первичный ключ по геохэшу служит пространственным индексом:
+        # соседние точки имеют общий префикс и лежат рядом в B-дереве.
+        self.__cursor.execute("""
+        CREATE TABLE IF NOT EXISTS forecast_cache (
+            geohash TEXT NOT NULL,
+            params TEXT NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            fetched_at REAL NOT NULL,
+            payload TEXT NOT NULL,
+            PRIMARY KEY (geohash, params)
+        ) WITHOUT ROWID
+        """)
+        self.__connection.commit()
+
+    def _create_weather_history_table(self) -> None:
+        self.__cursor.execute("""
+        CREATE TABLE IF NOT EXISTS weather_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            geohash TEXT NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            time INTEGER NOT NULL,
+            fetched_at REAL NOT NULL,
+            temperature_2m REAL,
+            apparent_temperature REAL,
+            relative_humidity_2m REAL,
+            precipitation REAL,
+            weather_code REAL,
+            pressure_msl REAL,
+            wind_speed_10m REAL,
+            wind_direction_10m REAL,
+            UNIQUE (geohash, time)
+        )
+        """)
+        self.__connection.commit()
+
+    def _create_forecast_change_table(self) -> None:
+        self.__cursor.execute("""
+        CREATE TABLE IF NOT EXISTS forecast_change (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            geohash TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            deltas TEXT NOT NULL
+        )
+        """)
+        self.__cursor.execute("""
+        CREATE INDEX IF NOT EXISTS forecast_change_fetched_at
+        ON forecast_change(fetched_at)
+        """)
+        self.__connection.commit()
+
+    def _create_unknown_city_table(self) -> None:
+        self.__cursor.execute("""
+        CREATE TABLE IF NOT EXISTS unknown_city (
+            name TEXT PRIMARY KEY,
+            failed_at REAL NOT NULL
+        ) WITHOUT ROWID
+        """)
+        self.__connection.commit()
+
     def get_all_favourite_cities(self) -> list[str]:
         self.__cursor.execute('SELECT * FROM favourite_city')
         favourite_cities = self.__cursor.fetchall()
@@ -73,6 +177,48 @@ class DataBase:
                               (city,))
         self.__connection.commit()
 
+    def add_favourite_cities(
+            self, cities: list[tuple[str, float, float]]) -> None:
+        with self.__connection:
+            self.__cursor.executemany(
+                    'INSERT OR IGNORE INTO favourite_city(name) VALUES (?)',
+                    [(name,) for name, _, _ in cities],
+                    )
+            self.__cursor.executemany(
+                    'INSERT OR REPLACE INTO city_location'
+                    '(name, latitude, longitude) VALUES (?, ?, ?)',
+                    cities,
+                    )
+
+    def iter_favourite_cities(
+            self,
+            chunk_size: int = 1000,
+            ) -> Iterator[tuple[str, float | None, float | None]]:
+        cursor = self.__connection.execute("""
+        SELECT favourite_city.name, city_location.latitude,
+               city_location.longitude
+        FROM favourite_city
+        LEFT JOIN city_location ON city_location.name = favourite_city.name
+        ORDER BY favourite_city.id
+        """)
+
+        while rows := cursor.fetchmany(chunk_size):
+            yield from rows
+
+    def get_all_city_locations(self) -> list[tuple[str, float, float]]:
+        self.__cursor.execute(
+                'SELECT name, latitude, longitude FROM city_location')
+        return self.__cursor.fetchall()
+
+    def add_city_locations(
+            self, locations: list[tuple[str, float, float]]) -> None:
+        with self.__connection:
+            self.__cursor.executemany(
+                    'INSERT OR REPLACE INTO city_location'
+                    '(name, latitude, longitude) VALUES (?, ?, ?)',
+                    locations,
+                    )
+
     def add_last_used_city(self, city: str) -> None:
         self.__cursor.execute('INSERT INTO last_used_city(name) VALUES (?)',
                               (city,))
@@ -92,3 +238,165 @@ class DataBase:
     def delete_favourite_weather(self) -> None:
         self.__cursor.execute('DELETE FROM favourite_weather')
         self.__connection.commit()
+
+    def get_all_alert_rules(self) -> list[tuple[int, str, str, str]]:
+        self.__cursor.execute(
+                'SELECT id, name, phrase, conditions FROM alert_rule')
+        return self.__cursor.fetchall()
+
+    def add_alert_rule(self, name: str, phrase: str, conditions: str) -> None:
+        self.__cursor.execute(
+                'INSERT INTO alert_rule(name, phrase, conditions) '
+                'VALUES (?, ?, ?)',
+                (name, phrase, conditions),
+                )
+        self.__connection.commit()
+
+    def delete_alert_rule(self, name: str) -> None:
+        self.__cursor.execute('DELETE FROM alert_rule WHERE name = ?',
+                              (name,))
+        self.__cursor.execute(
+                'DELETE FROM alert_notification WHERE rule_id NOT IN '
+                '(SELECT id FROM alert_rule)')
+        self.__connection.commit()
+
+    def get_alert_notifications(self, day: str) -> set[tuple[int, str]]:
+        self.__cursor.execute(
+                'SELECT rule_id, city FROM alert_notification WHERE day = ?',
+                (day,))
+        return set(self.__cursor.fetchall())
+
+    def add_alert_notifications(
+            self, notifications: list[tuple[int, str, str]]) -> None:
+        self.__cursor.executemany(
+                'INSERT OR IGNORE INTO alert_notification(rule_id, city, day) '
+                'VALUES (?, ?, ?)',
+                notifications,
+                )
+        self.__connection.commit()
+
+    def get_cached_forecast(
+            self,
+            geohash: str,
+            params: str,
+            fetched_after: float,
+            ) -> tuple[float, str] | None:
+        self.__cursor.execute(
+                'SELECT fetched_at, payload FROM forecast_cache '
+                'WHERE geohash = ? AND params = ? AND fetched_at > ?',
+                (geohash, params, fetched_after),
+                )
+        cached_forecast = self.__cursor.fetchone()
+
+        if not cached_forecast:
+            return None
+
+        return cached_forecast
+
+    def get_cached_forecasts_by_prefix(
+            self,
+            prefix: str,
+            fetched_after: float,
+            ) -> list[tuple[str, str, float, float, str]]:
+        # Все геохэши с общим префиксом лежат в диапазоне
+        # [prefix, prefix + '{'), так как '{' следует в ASCII сразу
+        # за последним символом алфавита геохэша 'z'.
+        self.__cursor.execute(
+                'SELECT geohash, params, latitude, longitude, payload '
+                'FROM forecast_cache '
+                'WHERE geohash >= ? AND geohash < ? AND fetched_at > ?',
+                (prefix, prefix + '{', fetched_after),
+                )
+        return self.__cursor.fetchall()
+
+    def save_cached_forecasts(
+            self,
+            forecasts: list[tuple[str, str, float, float, float, str]],
+            history: list[tuple] = (),
+            changes: list[tuple[str, float, str]] = (),
+            changes_expired_before: float | None = None,
+            ) -> None:
+        with self.__connection:
+            if changes_expired_before is not None:
+                self.__cursor.execute(
+                        'DELETE FROM forecast_change WHERE fetched_at < ?',
+                        (changes_expired_before,),
+                        )
+
+            self.__cursor.executemany(
+                    'INSERT OR REPLACE INTO forecast_cache'
+                    '(geohash, params, latitude, longitude, fetched_at, '
+                    'payload) VALUES (?, ?, ?, ?, ?, ?)',
+                    forecasts,
+                    )
+            self.__cursor.executemany(
+                    'INSERT OR IGNORE INTO weather_history'
+                    '(geohash, latitude, longitude, time, fetched_at, '
+                    'temperature_2m, apparent_temperature, '
+                    'relative_humidity_2m, precipitation, weather_code, '
+                    'pressure_msl, wind_speed_10m, wind_direction_10m) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    history,
+                    )
+            self.__cursor.executemany(
+                    'INSERT INTO forecast_change(geohash, fetched_at, deltas) '
+                    'VALUES (?, ?, ?)',
+                    changes,
+                    )
+
+    def iter_weather_history(
+            self,
+            after_id: int = 0,
+            chunk_size: int = 65536,
+            ) -> Iterator[list[tuple]]:
+        cursor = self.__connection.execute(
+                'SELECT * FROM weather_history WHERE id > ? ORDER BY id',
+                (after_id,),
+                )
+
+        while rows := cursor.fetchmany(chunk_size):
+            yield rows
+
+    def get_forecast_changes(
+            self,
+            after_id: int = 0,
+            limit: int = 1000,
+            ) -> list[tuple[int, str, float, str]]:
+        self.__cursor.execute(
+                'SELECT * FROM forecast_change WHERE id > ? ORDER BY id '
+                'LIMIT ?',
+                (after_id, limit),
+                )
+        return self.__cursor.fetchall()
+
+    def get_unknown_city(self, name: str,
+                         failed_after: float) -> float | None:
+        self.__cursor.execute(
+                'SELECT failed_at FROM unknown_city '
+                'WHERE name = ? AND failed_at > ?',
+                (name, failed_after),
+                )
+        unknown_city = self.__cursor.fetchone()
+
+        if not unknown_city:
+            return None
+
+        return unknown_city[0]
+
+    def add_unknown_city(self, name: str, failed_at: float,
+                         expired_before: float) -> None:
+        with self.__connection:
+            self.__cursor.execute(
+                    'DELETE FROM unknown_city WHERE failed_at < ?',
+                    (expired_before,),
+                    )
+            self.__cursor.execute(
+                    'INSERT OR REPLACE INTO unknown_city(name, failed_at) '
+                    'VALUES (?, ?)',
+                    (name, failed_at),
+                    )
+
+    def delete_unknown_city(self, name: str) -> None:
+        self.__cursor.execute('DELETE FROM unknown_city WHERE name = ?',
+                              (name,))
+        self.__connection.commit()
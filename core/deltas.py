@@ -0,0 +1,343 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass
+
+from core.db import DataBase
+from core.snapshot import (ALL_CURRENT_FIELDS, DAILY_FIELDS, HOURLY_FIELDS,
+                           WeatherSnapshot)
+
+DELTA_THRESHOLDS = {
+    'temperature_2m': 0.5,
+    'apparent_temperature': 0.5,
+    'relative_humidity_2m': 5.0,
+    'precipitation': 0.1,
+    'pressure_msl': 1.0,
+    'wind_speed_10m': 1.0,
+    'wind_direction_10m': 20.0,
+    'european_aqi': 5.0,
+    'pm10': 5.0,
+    'pm2_5': 5.0,
+    'wave_height': 0.2,
+    'wave_direction': 20.0,
+    'wave_period': 1.0,
+    'temperature_2m_max': 0.5,
+    'temperature_2m_min': 0.5,
+    'precipitation_sum': 0.5,
+    'wind_speed_10m_max': 1.0,
+    }
+
+CIRCULAR_VARIABLES = {'wind_direction_10m': 360.0, 'wave_direction': 360.0}
+
+# Сколько секунд изменения хранятся в таблице forecast_change.
+CHANGE_RETENTION = 7 * 24 * 60 * 60
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Delta:
+    """Класс, описывающий изменение одной ячейки прогноза.
+
+    Attributes:
+        variable: Переменная Open-Meteo.
+        date: None для текущих значений, дата дня прогноза или час
+            почасового прогноза.
+        old: Предыдущее значение.
+        new: Новое значение.
+    """
+
+    variable: str
+    date: str | None
+    old: float | None
+    new: float | None
+
+
+@dataclass(frozen=True)
+class ForecastChange:
+    """Класс, описывающий изменения прогноза ячейки при обновлении.
+
+    Attributes:
+        id: Номер записи в таблице forecast_change или None для
+            изменений, полученных по подписке.
+        cell: Геохэш ячейки.
+        fetched_at: Время получения нового прогноза.
+        deltas: Изменившиеся ячейки прогноза.
+    """
+
+    id: int | None
+    cell: str
+    fetched_at: float
+    deltas: tuple[Delta, ...]
+
+    @classmethod
+    def from_row(cls, row: tuple[int, str, float, str]) -> ForecastChange:
+        """Создаёт изменение из строки таблицы forecast_change.
+
+        Args:
+            row: Строка таблицы (id, geohash, fetched_at, deltas).
+
+        Returns:
+            Возвращает изменение прогноза.
+        """
+        change_id, cell, fetched_at, deltas = row
+        return cls(
+                id=change_id,
+                cell=cell,
+                fetched_at=fetched_at,
+                deltas=tuple(Delta(*delta) for delta in json.loads(deltas)),
+                )
+
+    def get_row(self) -> tuple[str, float, str]:
+        """Представляет изменение строкой таблицы forecast_change.
+
+        Изменения хранятся одной строкой на обновление в виде компактного
+        JSON списка [переменная, дата, старое, новое].
+
+        Returns:
+            Возвращает строку таблицы без id.
+        """
+        deltas = json.dumps(
+                [[delta.variable, delta.date, delta.old, delta.new]
+                 for delta in self.deltas],
+                separators=(',', ':'),
+                )
+        return self.cell, self.fetched_at, deltas
+
+    def to_dict(self) -> dict:
+        """Представляет изменение словарём для сериализации в JSON.
+
+        Returns:
+            Возвращает словарь с id, ячейкой, временем и изменениями.
+        """
+        return {
+            'id': self.id,
+            'geohash': self.cell,
+            'fetched_at': self.fetched_at,
+            'deltas': [{'variable': delta.variable, 'date': delta.date,
+                        'old': delta.old, 'new': delta.new}
+                       for delta in self.deltas],
+            }
+
+
+def get_cells(
+        snapshot: WeatherSnapshot,
+        ) -> dict[tuple[str, str | None], float | None]:
+    """Получает ячейки прогноза, пригодные для сравнения.
+
+    Дневные и почасовые значения адресуются датой и часом, а не номером
+    в прогнозе, чтобы смена суток не выглядела как изменение всего
+    прогноза.
+
+    Args:
+        snapshot: Снимок погоды.
+
+    Returns:
+        Возвращает словарь, где ключ - пара (переменная, дата).
+    """
+    cells = {(name, None): getattr(snapshot, name)
+             for name in ALL_CURRENT_FIELDS}
+
+    for name in DAILY_FIELDS:
+        values = getattr(snapshot, f'daily_{name}')
+        for date, value in zip(snapshot.daily_time, values):
+            cells[(name, date)] = value
+
+    for name in HOURLY_FIELDS:
+        values = getattr(snapshot, f'hourly_{name}')
+        for hour, value in zip(snapshot.hourly_time, values):
+            cells[(name, hour)] = value
+
+    return cells
+
+
+def is_changed(variable: str, old: float | None, new: float | None,
+               thresholds: Mapping[str, float]) -> bool:
+    """Проверяет, существенно ли изменилось значение.
+
+    Переменные без порога, например weather_code, считаются изменившимися
+    при любом отличии.
+
+    Args:
+        variable: Переменная Open-Meteo.
+        old: Предыдущее значение.
+        new: Новое значение.
+        thresholds: Минимальные существенные изменения по переменным.
+
+    Returns:
+        Возвращает True, если изменение существенно.
+    """
+    if old is None or new is None:
+        return old is not new
+
+    difference = abs(new - old)
+
+    if variable in CIRCULAR_VARIABLES:
+        difference = min(difference,
+                         CIRCULAR_VARIABLES[variable] - difference)
+
+    threshold = thresholds.get(variable)
+
+    if threshold is None:
+        return difference != 0
+
+    return difference >= threshold
+
+
+def diff_snapshots(
+        old: WeatherSnapshot,
+        new: WeatherSnapshot,
+        thresholds: Mapping[str, float] = DELTA_THRESHOLDS,
+        ) -> list[Delta]:
+    """Сравнивает два снимка погоды одной ячейки.
+
+    Дни и часы, выпавшие из прогноза, изменениями не считаются, новые
+    считаются изменениями с предыдущим значением None. Значения
+    источников, не ответивших в одном из снимков, не сравниваются.
+
+    Args:
+        old: Предыдущий снимок.
+        new: Новый снимок.
+        thresholds: Минимальные существенные изменения по переменным.
+
+    Returns:
+        Возвращает изменившиеся ячейки прогноза.
+    """
+    old_cells = get_cells(old)
+    skipped = old.get_unavailable_fields() | new.get_unavailable_fields()
+
+    deltas = []
+    for (variable, date), value in get_cells(new).items():
+        if date is None and variable in skipped:
+            continue
+
+        old_value = old_cells.get((variable, date))
+
+        if is_changed(variable, old_value, value, thresholds):
+            deltas.append(Delta(variable=variable, date=date,
+                                old=old_value, new=value))
+
+    return deltas
+
+
+def get_change(
+        cell: str,
+        previous: str | None,
+        snapshot: WeatherSnapshot,
+        fetched_at: float,
+        thresholds: Mapping[str, float] = DELTA_THRESHOLDS,
+        ) -> ForecastChange | None:
+    """Сравнивает новый прогноз ячейки с предыдущим закэшированным.
+
+    Args:
+        cell: Геохэш ячейки.
+        previous: Предыдущий прогноз из таблицы forecast_cache в JSON
+            или None, если ячейка ещё не загружалась.
+        snapshot: Новый снимок погоды.
+        fetched_at: Время получения нового прогноза.
+        thresholds: Минимальные существенные изменения по переменным.
+
+    Returns:
+        Возвращает изменение или None, если сравнивать не с чем или
+        прогноз существенно не изменился.
+    """
+    if previous is None:
+        return None
+
+    deltas = diff_snapshots(WeatherSnapshot.from_dict(json.loads(previous)),
+                            snapshot, thresholds)
+
+    if not deltas:
+        return None
+
+    return ForecastChange(id=None, cell=cell, fetched_at=fetched_at,
+                          deltas=tuple(deltas))
+
+
+class ChangeFeed:
+    """Класс, рассылающий изменения прогнозов подписчикам.
+
+    Подписчики вызываются синхронно в потоке, получившем новый прогноз,
+    поэтому обработчик не должен долго блокироваться. Исключение
+    подписчика записывается в журнал и не мешает ни остальным
+    подписчикам, ни получению прогноза.
+    """
+
+    def __init__(self) -> None:
+        """Устанавливает атрибуты для объекта ChangeFeed."""
+        self.__subscribers: dict[int, tuple[Callable[[ForecastChange], None],
+                                            frozenset[str] | None]] = {}
+        self.__next_token = 0
+        self.__lock = threading.Lock()
+
+    def subscribe(
+            self,
+            callback: Callable[[ForecastChange], None],
+            cells: Iterable[str] | None = None,
+            ) -> Callable[[], None]:
+        """Подписывает функцию на изменения прогнозов.
+
+        Args:
+            callback: Функция, получающая изменения.
+            cells: Геохэши интересующих ячеек или None для всех ячеек.
+
+        Returns:
+            Возвращает функцию, отменяющую подписку.
+        """
+        with self.__lock:
+            token = self.__next_token
+            self.__next_token += 1
+            self.__subscribers[token] = (
+                    callback, None if cells is None else frozenset(cells))
+
+        def unsubscribe() -> None:
+            with self.__lock:
+                self.__subscribers.pop(token, None)
+
+        return unsubscribe
+
+    def publish(self, change: ForecastChange) -> None:
+        """Передаёт изменение всем подходящим подписчикам.
+
+        Args:
+            change: Изменение прогноза.
+        """
+        with self.__lock:
+            subscribers = list(self.__subscribers.values())
+
+        for callback, cells in subscribers:
+            if cells is not None and change.cell not in cells:
+                continue
+
+            try:
+                callback(change)
+            except Exception:
+                logger.exception('Ошибка подписчика на изменения прогноза '
+                                 'ячейки %s', change.cell)
+
+
+def get_forecast_changes(
+        database: DataBase,
+        after_id: int = 0,
+        limit: int = 1000,
+        ) -> list[ForecastChange]:
+    """Загружает сохранённые изменения прогнозов.
+
+    Позволяет другим процессам, например демону обновления кэша, и
+    внешним потребителям читать изменения по курсору. Изменения старше
+    CHANGE_RETENTION удаляются, поэтому потребитель, отставший сильнее,
+    пропустит часть изменений.
+
+    Args:
+        database: База данных.
+        after_id: Номер последнего прочитанного изменения.
+        limit: Максимальное количество изменений.
+
+    Returns:
+        Возвращает изменения в порядке сохранения.
+    """
+    return [ForecastChange.from_row(row)
+            for row in database.get_forecast_changes(after_id, limit)]
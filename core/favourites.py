@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from core.db import DataBase
+from core.weather import Weather, get_geolocation
+
+GEOCODE_WORKERS = 4
+
+
+@dataclass
+class ImportReport:
+    """Класс, описывающий результат массового импорта любимых городов.
+
+    Attributes:
+        imported: Города, добавленные в любимые.
+        failures: Ошибки по строкам: (номер строки, город, причина).
+    """
+
+    imported: list[str] = field(default_factory=list)
+    failures: list[tuple[int, str, str]] = field(default_factory=list)
+
+
+class CityFileError(Exception):
+    """Класс, описывающий ошибку в формате файла с городами."""
+    pass
+
+
+def read_city_names(path: str) -> Iterator[tuple[int, str, str | None]]:
+    """Читает названия городов из CSV или JSON файла.
+
+    CSV файл должен содержать столбец name и может начинаться с метки
+    порядка байтов, которую добавляет Excel. JSON файл должен содержать
+    список строк или объектов с ключом name.
+
+    Args:
+        path: Путь к файлу.
+
+    Returns:
+        Возвращает тройки (номер строки, название города, ошибка), где
+        ошибка - None или причина, по которой строка не содержит
+        названия.
+    """
+    if os.path.splitext(path)[1].lower() == '.json':
+        with open(path, encoding='utf-8-sig') as file:
+            try:
+                items = json.load(file)
+            except json.JSONDecodeError as ex:
+                error_message = f'Некорректный JSON файл: {ex}'
+                raise CityFileError(error_message)
+
+        if not isinstance(items, list):
+            error_message = 'JSON файл должен содержать список городов'
+            raise CityFileError(error_message)
+
+        for row_number, item in enumerate(items, start=1):
+            name = item.get('name', '') if isinstance(item, dict) else item
+
+            if isinstance(name, str):
+                yield row_number, name.strip(), None
+            else:
+                yield (row_number, json.dumps(item, ensure_ascii=False),
+                       'Название должно быть строкой')
+        return
+
+    with open(path, encoding='utf-8-sig', newline='') as file:
+        reader = csv.DictReader(file)
+
+        if 'name' not in (reader.fieldnames or []):
+            error_message = 'CSV файл должен содержать столбец name'
+            raise CityFileError(error_message)
+
+        for row_number, row in enumerate(reader, start=2):
+            yield row_number, (row.get('name') or '').strip(), None
+
+
+def import_favourite_cities(
+        database: DataBase,
+        path: str,
+        workers: int = GEOCODE_WORKERS,
+        ) -> ImportReport:
+    """Импортирует любимые города из файла.
+
+    Названия проверяются и геокодируются параллельно, частоту запросов
+    ограничивает get_geolocation. Все найденные города добавляются в базу
+    данных одной транзакцией.
+
+    Args:
+        database: База данных.
+        path: Путь к CSV или JSON файлу.
+        workers: Количество потоков для геокодирования.
+
+    Returns:
+        Возвращает отчёт об импорте.
+    """
+    report = ImportReport()
+    existing = set(database.get_all_favourite_cities())
+    seen = set()
+
+    rows = []
+    for row_number, name, error in read_city_names(path):
+        if error is not None:
+            report.failures.append((row_number, name, error))
+        elif not name:
+            report.failures.append((row_number, name, 'Пустое название'))
+        elif name in existing:
+            report.failures.append(
+                    (row_number, name, 'Город уже добавлен в любимые'))
+        elif name in seen:
+            report.failures.append(
+                    (row_number, name, 'Город повторяется в файле'))
+        else:
+            seen.add(name)
+            rows.append((row_number, name))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_geocode_row, rows)
+
+        cities = []
+        for (row_number, name), result in zip(rows, results):
+            if isinstance(result, Exception):
+                report.failures.append((row_number, name, str(result)))
+                continue
+
+            latitude, longitude = result
+            cities.append((name, latitude, longitude))
+            report.imported.append(name)
+
+    database.add_favourite_cities(cities)
+    report.failures.sort()
+    return report
+
+
+def get_favourite_locations(
+        database: DataBase,
+        workers: int = GEOCODE_WORKERS,
+        should_stop: Callable[[], bool] | None = None,
+        ) -> list[tuple[str, float, float]]:
+    """Получает координаты любимых городов.
+
+    Координаты берутся из таблицы city_location. Города без координат,
+    например добавленные до её появления, геокодируются параллельно, и
+    найденные координаты сохраняются, поэтому геокодирование выполняется
+    для каждого города один раз.
+
+    Args:
+        database: База данных.
+        workers: Количество потоков для геокодирования.
+        should_stop: Функция, возвращающая True, если работу нужно
+            прервать. Ещё не начатые геокодирования тогда пропускаются.
+
+    Returns:
+        Возвращает названия и координаты найденных городов.
+    """
+    locations = []
+    rows = []
+    for name, latitude, longitude in database.iter_favourite_cities():
+        if latitude is None:
+            rows.append((0, name))
+        else:
+            locations.append((name, latitude, longitude))
+
+    if not rows:
+        return locations
+
+    def geocode(row: tuple[int, str]) -> tuple[float, float] | Exception:
+        if should_stop is not None and should_stop():
+            return InterruptedError()
+        return _geocode_row(row)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(geocode, rows)
+
+        geocoded = []
+        for (_, name), result in zip(rows, results):
+            if isinstance(result, Exception):
+                continue
+
+            latitude, longitude = result
+            geocoded.append((name, latitude, longitude))
+
+    database.add_city_locations(geocoded)
+    return locations + geocoded
+
+
+def _geocode_row(row: tuple[int, str]) -> tuple[float, float] | Exception:
+    """Геокодирует одну строку импорта, не прерывая остальные.
+
+    Args:
+        row: Номер строки и название города.
+
+    Returns:
+        Возвращает координаты города или возникшую ошибку.
+    """
+    _, name = row
+    try:
+        return get_geolocation(name)
+    except (Weather.ArgumentError, Weather.ServerError) as ex:
+        return ex
+
+
+def export_favourite_cities(database: DataBase, path: str) -> int:
+    """Построчно выгружает любимые города в CSV или JSON файл.
+
+    Args:
+        database: База данных.
+        path: Путь к файлу.
+
+    Returns:
+        Возвращает количество выгруженных городов.
+    """
+    count = 0
+    cities = database.iter_favourite_cities()
+
+    if os.path.splitext(path)[1].lower() == '.json':
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('[')
+            for name, latitude, longitude in cities:
+                if count:
+                    file.write(',')
+                item = {'name': name,
+                        'latitude': latitude,
+                        'longitude': longitude}
+                file.write('\n    ' + json.dumps(item, ensure_ascii=False))
+                count += 1
+            file.write('\n]\n')
+        return count
+
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['name', 'latitude', 'longitude'])
+        for name, latitude, longitude in cities:
+            writer.writerow([name, latitude, longitude])
+            count += 1
+
+    return count
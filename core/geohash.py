@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_KM = 6371.0
+
+
+def encode(latitude: float, longitude: float, precision: int) -> str:
+    """Кодирует координаты в геохэш.
+
+    Args:
+        latitude: Широта.
+        longitude: Долгота.
+        precision: Длина геохэша в символах.
+
+    Returns:
+        Возвращает геохэш ячейки, в которую попадает точка.
+    """
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        if even:
+            value, value_range = longitude, longitude_range
+        else:
+            value, value_range = latitude, latitude_range
+
+        middle = (value_range[0] + value_range[1]) / 2
+        if value >= middle:
+            bits = bits * 2 + 1
+            value_range[0] = middle
+        else:
+            bits = bits * 2
+            value_range[1] = middle
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def decode(geohash: str) -> tuple[float, float, float, float]:
+    """Декодирует геохэш в центр ячейки и её размеры.
+
+    Args:
+        geohash: Геохэш.
+
+    Returns:
+        Возвращает широту и долготу центра ячейки, а также её высоту
+        и ширину в градусах.
+    """
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+
+    even = True
+    for char in geohash:
+        bits = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            value_range = longitude_range if even else latitude_range
+            middle = (value_range[0] + value_range[1]) / 2
+            if bits >> shift & 1:
+                value_range[0] = middle
+            else:
+                value_range[1] = middle
+            even = not even
+
+    return (
+        (latitude_range[0] + latitude_range[1]) / 2,
+        (longitude_range[0] + longitude_range[1]) / 2,
+        latitude_range[1] - latitude_range[0],
+        longitude_range[1] - longitude_range[0],
+        )
+
+
+def neighbours(geohash: str) -> list[str]:
+    """Получает ячейку и восемь соседних с ней ячеек.
+
+    Args:
+        geohash: Геохэш.
+
+    Returns:
+        Возвращает геохэши ячейки и её соседей без повторов.
+    """
+    latitude, longitude, height, width = decode(geohash)
+
+    cells = []
+    for latitude_step in (-1, 0, 1):
+        for longitude_step in (-1, 0, 1):
+            neighbour_latitude = latitude + latitude_step * height
+            if not -90 <= neighbour_latitude <= 90:
+                continue
+
+            neighbour_longitude = ((longitude + longitude_step * width + 180)
+                                   % 360 - 180)
+            cell = encode(neighbour_latitude, neighbour_longitude,
+                          len(geohash))
+            if cell not in cells:
+                cells.append(cell)
+
+    return cells
+
+
+def distance_km(latitude_1: float, longitude_1: float,
+                latitude_2: float, longitude_2: float) -> float:
+    """Вычисляет расстояние между точками по формуле гаверсинусов.
+
+    Returns:
+        Возвращает расстояние в километрах.
+    """
+    phi_1 = math.radians(latitude_1)
+    phi_2 = math.radians(latitude_2)
+    delta_phi = phi_2 - phi_1
+    delta_lambda = math.radians(longitude_2 - longitude_1)
+
+    a = (math.sin(delta_phi / 2) ** 2
+         + math.cos(phi_1) * math.cos(phi_2)
+         * math.sin(delta_lambda / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import sys
+from array import array
+from typing import Any
+
+from core.db import DataBase
+from core.snapshot import CURRENT_FIELDS
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+HISTORY_COLUMNS = (
+    ('id', '<i8'),
+    ('geohash', '|S12'),
+    ('latitude', '<f8'),
+    ('longitude', '<f8'),
+    ('time', '<i8'),
+    ('fetched_at', '<f8'),
+    *((name, '<f8') for name in CURRENT_FIELDS),
+    )
+EXPORT_FORMATS = ('arrow', 'parquet', 'binary')
+MANIFEST_NAME = 'manifest.json'
+CHUNK_SIZE = 65536
+
+ARRAY_TYPECODES = {'<i8': 'q', '<f8': 'd'}
+ARROW_TYPES = {'<i8': 'int64', '<f8': 'float64', '|S12': 'string'}
+
+
+def get_default_format() -> str:
+    """Выбирает формат выгрузки по доступным библиотекам.
+
+    Returns:
+        Возвращает 'arrow', если установлен pyarrow, иначе 'binary'.
+    """
+    return 'binary' if pyarrow is None else 'arrow'
+
+
+def read_manifest(directory: str) -> dict[str, Any] | None:
+    """Читает описание выгруженного набора данных.
+
+    Args:
+        directory: Каталог набора данных.
+
+    Returns:
+        Возвращает описание или None, если выгрузок ещё не было.
+    """
+    path = os.path.join(directory, MANIFEST_NAME)
+
+    if not os.path.exists(path):
+        return None
+
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def export_history(
+        database: DataBase,
+        directory: str,
+        format: str | None = None,
+        incremental: bool = True,
+        chunk_size: int = CHUNK_SIZE,
+        ) -> int:
+    """Выгружает историю погоды в колоночный формат.
+
+    Каталог - это набор данных. Для Arrow IPC и Parquet каждая выгрузка
+    добавляет файл part-<первый id>-<последний id>, который читается
+    pandas, pyarrow.dataset и DuckDB. Для формата binary у каждого столбца
+    свой файл <столбец>.bin с массивом значений фиксированной ширины
+    (little-endian, тип указан в manifest.json), который можно открыть
+    через numpy.memmap, а новые строки дописываются в конец файлов.
+    Пропуски хранятся как NaN. В manifest.json записываются формат,
+    столбцы, количество строк и id последней выгруженной строки.
+
+    Строки читаются и записываются порциями по chunk_size, поэтому
+    расход памяти не зависит от размера истории.
+
+    Args:
+        database: База данных.
+        directory: Каталог набора данных.
+        format: 'arrow', 'parquet' или 'binary'. По умолчанию формат
+            существующего набора или get_default_format.
+        incremental: Выгрузить только строки, добавленные после прошлой
+            выгрузки. Если False, каталог не должен содержать набор.
+        chunk_size: Количество строк в одной порции.
+
+    Returns:
+        Возвращает количество выгруженных строк.
+    """
+    manifest = read_manifest(directory)
+
+    if manifest is not None and not incremental:
+        error_message = f'Каталог уже содержит выгрузку: {directory}'
+        raise FileExistsError(error_message)
+
+    if manifest is None:
+        manifest = {
+            'format': format or get_default_format(),
+            'columns': [list(column) for column in HISTORY_COLUMNS],
+            'rows': 0,
+            'last_id': 0,
+            }
+    elif format is not None and format != manifest['format']:
+        error_message = (f'Каталог содержит выгрузку в формате '
+                         f'{manifest["format"]}, а не {format}')
+        raise ValueError(error_message)
+
+    format = manifest['format']
+
+    if format not in EXPORT_FORMATS:
+        error_message = f'Неизвестный формат выгрузки: {format}'
+        raise ValueError(error_message)
+
+    if format != 'binary' and pyarrow is None:
+        error_message = f'Для формата {format} нужен пакет pyarrow'
+        raise ValueError(error_message)
+
+    os.makedirs(directory, exist_ok=True)
+    chunks = database.iter_weather_history(manifest['last_id'], chunk_size)
+
+    if format == 'binary':
+        rows, last_id = _write_binary(directory, manifest['rows'], chunks)
+    else:
+        rows, last_id = _write_arrow(directory, format, chunks)
+
+    if rows:
+        manifest['rows'] += rows
+        manifest['last_id'] = last_id
+        _write_manifest(directory, manifest)
+
+    return rows
+
+
+def _get_columns(rows: list[tuple]) -> list[list[Any]]:
+    """Транспонирует порцию строк в столбцы, заменяя None на NaN."""
+    columns = [list(column) for column in zip(*rows)]
+
+    for index, (_, dtype) in enumerate(HISTORY_COLUMNS):
+        if dtype == '<f8':
+            columns[index] = [math.nan if value is None else value
+                              for value in columns[index]]
+
+    return columns
+
+
+def _write_binary(directory: str, rows_before: int,
+                  chunks: Any) -> tuple[int, int]:
+    """Дописывает порции в файлы столбцов.
+
+    Хвосты файлов, оставшиеся от прерванной выгрузки, отрезаются по
+    количеству строк из manifest.json.
+
+    Returns:
+        Возвращает количество строк и id последней строки.
+    """
+    files = {}
+    rows = last_id = 0
+
+    try:
+        for name, dtype in HISTORY_COLUMNS:
+            path = os.path.join(directory, f'{name}.bin')
+            file = open(path, 'ab')
+            file.truncate(rows_before * int(dtype[2:]))
+            files[name] = file
+
+        for chunk in chunks:
+            columns = _get_columns(chunk)
+
+            for (name, dtype), values in zip(HISTORY_COLUMNS, columns):
+                if dtype == '|S12':
+                    data = b''.join(value.encode('ascii').ljust(12, b'\0')
+                                    for value in values)
+                    files[name].write(data)
+                    continue
+
+                data = array(ARRAY_TYPECODES[dtype], values)
+
+                if sys.byteorder == 'big':
+                    data.byteswap()
+
+                data.tofile(files[name])
+
+            rows += len(chunk)
+            last_id = chunk[-1][0]
+    finally:
+        for file in files.values():
+            file.close()
+
+    return rows, last_id
+
+
+def _write_arrow(directory: str, format: str,
+                 chunks: Any) -> tuple[int, int]:
+    """Записывает порции в новый файл Arrow IPC или Parquet.
+
+    Файл пишется под временным именем и переименовывается после
+    последней порции, поэтому прерванная выгрузка не оставляет в наборе
+    неполных файлов.
+
+    Returns:
+        Возвращает количество строк и id последней строки.
+    """
+    schema = pyarrow.schema([(name, ARROW_TYPES[dtype])
+                             for name, dtype in HISTORY_COLUMNS])
+    extension = 'arrow' if format == 'arrow' else 'parquet'
+    temporary_path = os.path.join(directory, f'.part.{extension}.tmp')
+    writer = None
+    rows = first_id = last_id = 0
+
+    try:
+        for chunk in chunks:
+            table = pyarrow.Table.from_arrays(
+                    [pyarrow.array(values, type=field.type)
+                     for values, field in zip(_get_columns(chunk), schema)],
+                    schema=schema,
+                    )
+
+            if writer is None:
+                first_id = chunk[0][0]
+                if format == 'arrow':
+                    writer = pyarrow.ipc.new_file(temporary_path, schema)
+                else:
+                    writer = pyarrow.parquet.ParquetWriter(temporary_path,
+                                                           schema)
+
+            writer.write_table(table)
+            rows += len(chunk)
+            last_id = chunk[-1][0]
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if rows:
+        os.replace(temporary_path, os.path.join(
+                directory, f'part-{first_id:012d}-{last_id:012d}.'
+                           f'{extension}'))
+
+    return rows, last_id
+
+
+def _write_manifest(directory: str, manifest: dict[str, Any]) -> None:
+    path = os.path.join(directory, MANIFEST_NAME)
+    temporary_path = path + '.tmp'
+
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=4)
+
+    os.replace(temporary_path, path)
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from core.cache import TTLCache
+from core.db import DataBase
+
+
+class NegativeCache:
+    """Класс, описывающий кэш неудачных поисков.
+
+    Ключи хранятся в памяти и в таблице unknown_city, поэтому повторный
+    поиск того же ключа в течение срока жизни записи, в том числе после
+    перезапуска программы или из другого процесса, завершается сразу,
+    без запроса к серверу.
+    """
+
+    def __init__(self, ttl: float, path: str = 'db.sql',
+                 maxsize: int = 10000) -> None:
+        """Устанавливает атрибуты для объекта NegativeCache.
+
+        Args:
+            ttl: Срок жизни записи в секундах.
+            path: Путь к базе данных.
+            maxsize: Максимальное количество записей в памяти.
+        """
+        self.__ttl = ttl
+        self.__path = path
+        self.__memory = TTLCache(ttl=ttl, maxsize=maxsize)
+        self.__local = threading.local()
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self.__memory)
+
+    def __get_database(self) -> DataBase:
+        """Получает соединение с базой данных для текущего потока.
+
+        Returns:
+            Возвращает базу данных.
+        """
+        database = getattr(self.__local, 'database', None)
+
+        if database is None:
+            database = DataBase(self.__path)
+            self.__local.database = database
+
+        return database
+
+    def contains(self, key: str) -> bool:
+        """Проверяет, был ли поиск ключа недавно неудачным.
+
+        Args:
+            key: Ключ.
+
+        Returns:
+            Возвращает True, если ключ есть в кэше.
+        """
+        if self.__memory.get(key, False):
+            self.hits += 1
+            return True
+
+        failed_at = self.__get_database().get_unknown_city(
+                key, time.time() - self.__ttl)
+
+        if failed_at is None:
+            return False
+
+        # В памяти запись живёт столько, сколько ей осталось в базе.
+        self.__memory.set(key, True,
+                          ttl=failed_at + self.__ttl - time.time())
+        self.hits += 1
+        return True
+
+    def add(self, key: str) -> None:
+        """Запоминает неудачный поиск ключа.
+
+        Args:
+            key: Ключ.
+        """
+        now = time.time()
+        self.__memory.set(key, True)
+        self.__get_database().add_unknown_city(key, now, now - self.__ttl)
+
+    def discard(self, key: str) -> None:
+        """Забывает неудачный поиск ключа.
+
+        Args:
+            key: Ключ.
+        """
+        self.__memory.set(key, False)
+        self.__get_database().delete_unknown_city(key)
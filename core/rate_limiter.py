@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import threading
+import time
+
+
+class RateLimiter:
+    """Класс, ограничивающий частоту запросов к внешнему сервису.
+
+    Реализует «ведро токенов»: каждый вызов acquire резервирует один токен,
+    а если токенов нет, ждёт ровно столько, сколько нужно до появления
+    зарезервированного. Объект можно разделять между потоками.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        """Устанавливает атрибуты для объекта RateLimiter.
+
+        Args:
+            rate: Допустимое количество запросов в секунду.
+            burst: Сколько запросов можно выполнить подряд без ожидания.
+        """
+        self.__rate = rate
+        self.__burst = burst
+        self.__tokens = float(burst)
+        self.__updated_at = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Ждёт, пока не станет можно выполнить очередной запрос."""
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(
+                    self.__burst,
+                    self.__tokens + (now - self.__updated_at) * self.__rate,
+                    )
+            self.__updated_at = now
+            self.__tokens -= 1
+            wait = -self.__tokens / self.__rate
+
+        if wait > 0:
+            time.sleep(wait)
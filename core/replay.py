@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import gzip
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import core.weather
+from core.alerts import ALERT_CURRENT_PARAMS
+from core.cache import TTLCache
+from core.negative_cache import NegativeCache
+from core.spatial_cache import SpatialForecastCache
+from core.transport import (HttpTransport, Transport, TransportError,
+                            TransportResponse)
+from core.weather import Weather, set_base_transport
+
+ARCHIVE_VERSION = 1
+NOMINATIM_HOST = 'nominatim.openstreetmap.org'
+
+
+def get_exchange_key(url: str, params: dict[str, Any] | None) -> str:
+    """Строит ключ запроса, не зависящий от порядка параметров.
+
+    Args:
+        url: Адрес.
+        params: Параметры запроса.
+
+    Returns:
+        Возвращает адрес с отсортированными параметрами.
+    """
+    if not params:
+        return url
+
+    separator = '&' if '?' in url else '?'
+    return url + separator + urlencode(sorted(params.items()), doseq=True)
+
+
+class ExchangeRecorder:
+    """Класс, записывающий обмен с внешними сервисами в архив.
+
+    Архив - это JSON Lines, сжатый gzip. Первая строка - заголовок с
+    версией формата, далее по строке на запрос: ключ запроса, смещение от
+    начала записи, длительность, код и тело ответа или текст ошибки.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Устанавливает атрибуты для объекта ExchangeRecorder.
+
+        Args:
+            path: Путь к архиву.
+        """
+        self.__file = gzip.open(path, 'wt', encoding='utf-8')
+        self.__started_at = time.monotonic()
+        self.__lock = threading.Lock()
+        self.__write({'version': ARCHIVE_VERSION, 'recorded_at': time.time()})
+
+    def __enter__(self) -> ExchangeRecorder:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def record(self, key: str, started_at: float, latency: float,
+               response: TransportResponse | None = None,
+               error: str | None = None) -> None:
+        """Записывает один запрос.
+
+        Args:
+            key: Ключ запроса.
+            started_at: Время начала запроса по time.monotonic.
+            latency: Длительность запроса в секундах.
+            response: Ответ, если запрос успешен.
+            error: Текст ошибки, если запрос не удался.
+        """
+        exchange = {
+            'key': key,
+            'offset': round(started_at - self.__started_at, 6),
+            'latency': round(latency, 6),
+            }
+        if response is not None:
+            exchange['status'] = response.status_code
+            exchange['body'] = response.content.decode('utf-8', 'replace')
+        else:
+            exchange['error'] = error
+
+        self.__write(exchange)
+
+    def close(self) -> None:
+        """Закрывает архив."""
+        with self.__lock:
+            self.__file.close()
+
+    def __write(self, data: dict[str, Any]) -> None:
+        line = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        with self.__lock:
+            self.__file.write(line + '\n')
+
+
+class RecordingTransport:
+    """Класс, записывающий запросы другого транспорта в архив."""
+
+    def __init__(self, transport: Transport,
+                 recorder: ExchangeRecorder) -> None:
+        """Устанавливает атрибуты для объекта RecordingTransport.
+
+        Args:
+            transport: Транспорт, выполняющий запросы.
+            recorder: Архив для записи.
+        """
+        self.__transport = transport
+        self.__recorder = recorder
+
+    def get(self, url: str, params: dict[str, Any] | None = None,
+            headers: dict[str, str] | None = None,
+            timeout: float | None = None) -> TransportResponse:
+        key = get_exchange_key(url, params)
+        started_at = time.monotonic()
+
+        try:
+            response = self.__transport.get(url, params=params,
+                                            headers=headers, timeout=timeout)
+        except TransportError as ex:
+            self.__recorder.record(key, started_at,
+                                   time.monotonic() - started_at,
+                                   error=str(ex))
+            raise
+
+        self.__recorder.record(key, started_at, time.monotonic() - started_at,
+                               response=response)
+        return response
+
+
+class ReplayTransport:
+    """Класс, отвечающий на запросы из записанного архива без сети.
+
+    Повторяющиеся запросы получают записанные ответы по кругу. В режиме
+    timing ответы приходят с записанной задержкой, а запросы, которые
+    не уложились бы в бюджет времени, завершаются тайм-аутом.
+    """
+
+    def __init__(self, path: str, timing: bool = False) -> None:
+        """Устанавливает атрибуты для объекта ReplayTransport.
+
+        Args:
+            path: Путь к архиву.
+            timing: Воспроизводить ли записанные задержки.
+        """
+        self.__timing = timing
+        self.__exchanges: dict[str, itertools.cycle] = {}
+        self.__cities = []
+        self.__lock = threading.Lock()
+
+        exchanges = {}
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            header = json.loads(file.readline())
+
+            if header.get('version') != ARCHIVE_VERSION:
+                error_message = f'Неподдерживаемая версия архива: {path}'
+                raise ValueError(error_message)
+
+            for line in file:
+                exchange = json.loads(line)
+                exchanges.setdefault(exchange['key'], []).append(exchange)
+                self.__collect_city(exchange['key'])
+
+        for key, recorded in exchanges.items():
+            self.__exchanges[key] = itertools.cycle(recorded)
+
+    def __collect_city(self, key: str) -> None:
+        url = urlsplit(key)
+
+        if url.hostname != NOMINATIM_HOST:
+            return
+
+        cities = parse_qs(url.query).get('q')
+
+        if cities:
+            self.__cities.append(cities[0])
+
+    def get_cities(self) -> list[str]:
+        """Получает города, которые геокодировались при записи.
+
+        Returns:
+            Возвращает названия городов в порядке запросов.
+        """
+        return list(self.__cities)
+
+    def get(self, url: str, params: dict[str, Any] | None = None,
+            headers: dict[str, str] | None = None,
+            timeout: float | None = None) -> TransportResponse:
+        key = get_exchange_key(url, params)
+
+        with self.__lock:
+            recorded = self.__exchanges.get(key)
+            exchange = None if recorded is None else next(recorded)
+
+        if exchange is None:
+            error_message = f'Запрос отсутствует в архиве: {key}'
+            raise TransportError(error_message)
+
+        if self.__timing:
+            latency = exchange['latency']
+
+            if timeout is not None and latency > timeout:
+                time.sleep(timeout)
+                raise TransportError('Превышено время ожидания ответа')
+
+            time.sleep(latency)
+
+        if 'error' in exchange:
+            raise TransportError(exchange['error'])
+
+        return TransportResponse(exchange['status'],
+                                 exchange['body'].encode('utf-8'))
+
+
+def record(path: str) -> ExchangeRecorder:
+    """Начинает записывать все запросы Weather в архив.
+
+    Args:
+        path: Путь к архиву.
+
+    Returns:
+        Возвращает архив, который нужно закрыть после записи.
+    """
+    recorder = ExchangeRecorder(path)
+    set_base_transport(RecordingTransport(HttpTransport(core.weather.SESSION),
+                                          recorder))
+    return recorder
+
+
+def replay(path: str, timing: bool = False) -> ReplayTransport:
+    """Переключает все запросы Weather на воспроизведение архива.
+
+    Ограничение частоты запросов при воспроизведении не действует.
+
+    Args:
+        path: Путь к архиву.
+        timing: Воспроизводить ли записанные задержки.
+
+    Returns:
+        Возвращает транспорт воспроизведения.
+    """
+    transport = ReplayTransport(path, timing)
+    set_base_transport(transport, rate_limited=False)
+    return transport
+
+
+def fetch_cities(cities: Iterable[str], workers: int = 8) -> dict[str, Any]:
+    """Получает погоду для списка городов без графического интерфейса.
+
+    Args:
+        cities: Названия городов.
+        workers: Количество потоков.
+
+    Returns:
+        Возвращает количество городов и ошибок, общее время, пропускную
+        способность и задержки p50 и p99 на город.
+    """
+    def fetch(city: str) -> float | None:
+        started_at = time.perf_counter()
+        try:
+            weather = Weather(city)
+            weather.set_current_params(ALERT_CURRENT_PARAMS)
+            weather.request_weather()
+        except (Weather.ArgumentError, Weather.ServerError):
+            return None
+
+        return time.perf_counter() - started_at
+
+    cities = list(cities)
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(fetch, cities))
+    seconds = time.perf_counter() - started_at
+
+    latencies = sorted(latency for latency in results if latency is not None)
+
+    def percentile(share: float) -> float | None:
+        if not latencies:
+            return None
+
+        index = min(len(latencies) - 1, int(len(latencies) * share))
+        return round(latencies[index] * 1000, 3)
+
+    return {
+        'cities': len(cities),
+        'errors': len(cities) - len(latencies),
+        'seconds': round(seconds, 3),
+        'cities_per_second': (round(len(cities) / seconds, 1)
+                              if seconds else None),
+        'latency_p50_ms': percentile(0.50),
+        'latency_p99_ms': percentile(0.99),
+        }
+
+
+def run_trace(path: str, timing: bool = False,
+              workers: int = 8) -> dict[str, Any]:
+    """Воспроизводит записанную нагрузку на пустых кэшах.
+
+    Кэши заменяются пустыми, а прогнозы сохраняются во временную базу
+    данных, чтобы результаты разных запусков и версий были сравнимы.
+
+    Args:
+        path: Путь к архиву.
+        timing: Воспроизводить ли записанные задержки.
+        workers: Количество потоков.
+
+    Returns:
+        Возвращает статистику, как fetch_cities.
+    """
+    transport = replay(path, timing)
+
+    # Соединения с базой остаются открытыми в потоках пула, поэтому в
+    # Windows файлы базы нельзя удалить, и ошибки удаления игнорируются.
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'db.sql')
+        core.weather.GEOCODE_CACHE = TTLCache(ttl=24 * 60 * 60)
+        core.weather.UNKNOWN_CITY_CACHE = NegativeCache(
+                ttl=core.weather.UNKNOWN_CITY_TTL, path=path)
+        core.weather.FORECAST_CACHE = SpatialForecastCache(
+                ttl=10 * 60, path=path)
+        core.weather.NO_COVERAGE_CACHE = TTLCache(ttl=24 * 60 * 60)
+        return fetch_cities(transport.get_cities(), workers)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
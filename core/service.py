@@ -0,0 +1,467 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+import core.weather
+from core.cache import TTLCache
+from core.weather import Weather
+
+DEFAULT_CURRENT_PARAMS = [
+    'temperature_2m',
+    'apparent_temperature',
+    'weather_code',
+    ]
+
+MAX_BATCH_SIZE = 500
+BATCH_CHUNK_SIZE = 50
+MAX_CHANGES = 1000
+
+
+class WeatherService(ThreadingHTTPServer):
+    """Класс, описывающий HTTP сервис с погодой для нескольких клиентов.
+
+    Все клиенты разделяют кэши геокодирования и прогнозов, пул соединений
+    и ограничители частоты запросов модуля core.weather, поэтому к внешним
+    сервисам уходит не больше одного запроса на город за время жизни кэша.
+
+    Поддерживаемые запросы:
+        GET /forecast?city=Москва&current=temperature_2m,weather_code
+        GET /forecast?city=Москва&recheck=1
+        GET /batch?city=Москва&city=Казань
+        GET /nearest?latitude=55.75&longitude=37.62
+        GET /changes?after=0&limit=1000
+        POST /batch с JSON телом {"cities": [...], "current": [...]}
+        GET /metrics
+
+    Если город не найден, /forecast отвечает статусом 404, если не
+    ответил внешний сервис - 502. /batch отвечает статусом 200, а ошибки
+    передаёт в элементах списка.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], workers: int = 16) -> None:
+        """Устанавливает атрибуты для объекта WeatherService.
+
+        Args:
+            address: Адрес и порт сервиса.
+            workers: Количество потоков для пакетных запросов.
+        """
+        super().__init__(address, WeatherRequestHandler)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.responses = TTLCache(ttl=60)
+        self.__latencies = deque(maxlen=10000)
+        self.__requests = 0
+        self.__lock = threading.Lock()
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+    def record_latency(self, seconds: float) -> None:
+        """Запоминает длительность обработки запроса.
+
+        Args:
+            seconds: Длительность в секундах.
+        """
+        with self.__lock:
+            self.__latencies.append(seconds)
+            self.__requests += 1
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Получает метрики сервиса.
+
+        Returns:
+            Возвращает количество запросов, задержки p50 и p99 за последние
+            10000 запросов, статистику кэшей и дублирования запросов.
+        """
+        with self.__lock:
+            latencies = sorted(self.__latencies)
+            requests_count = self.__requests
+
+        def percentile(share: float) -> float | None:
+            if not latencies:
+                return None
+
+            index = min(len(latencies) - 1, int(len(latencies) * share))
+            return round(latencies[index] * 1000, 3)
+
+        geocode_cache = core.weather.GEOCODE_CACHE
+        unknown_city_cache = core.weather.UNKNOWN_CITY_CACHE
+        forecast_cache = core.weather.FORECAST_CACHE
+
+        return {
+            'requests': requests_count,
+            'latency_p50_ms': percentile(0.50),
+            'latency_p99_ms': percentile(0.99),
+            'geocode_cache': {'size': len(geocode_cache),
+                              'hits': geocode_cache.hits,
+                              'misses': geocode_cache.misses},
+            'unknown_city_cache': {'size': len(unknown_city_cache),
+                                   'hits': unknown_city_cache.hits},
+            'forecast_cache': {'size': len(forecast_cache),
+                               'hits': forecast_cache.hits,
+                               'misses': forecast_cache.misses},
+            'upstream': core.weather.TRANSPORT.get_metrics(),
+            }
+
+    def get_forecast(
+            self,
+            city: str,
+            current: list[str],
+            recheck: bool = False,
+            ) -> tuple[HTTPStatus, dict[str, Any]]:
+        """Получает прогноз погоды для города.
+
+        Args:
+            city: Название города.
+            current: Требуемые параметры текущей погоды.
+            recheck: Искать город у Nominatim, даже если недавно он не
+                был найден.
+
+        Returns:
+            Возвращает HTTP статус и прогноз или описание ошибки: 404,
+            если город не найден, 400 для неизвестных параметров и 502,
+            если не ответил внешний сервис.
+        """
+        weather = self.__create_weather(city, current, recheck)
+
+        if not isinstance(weather, Weather):
+            return weather
+
+        try:
+            weather.request_weather()
+        except Weather.ServerError as ex:
+            return HTTPStatus.BAD_GATEWAY, {'city': city, 'error': str(ex)}
+
+        return HTTPStatus.OK, weather.to_dict()
+
+    @staticmethod
+    def __create_weather(
+            city: str,
+            current: list[str],
+            recheck: bool = False,
+            ) -> Weather | tuple[HTTPStatus, dict[str, Any]]:
+        """Находит город и проверяет параметры текущей погоды.
+
+        Args:
+            city: Название города.
+            current: Требуемые параметры текущей погоды.
+            recheck: Искать город у Nominatim, даже если недавно он не
+                был найден.
+
+        Returns:
+            Возвращает объект Weather без прогноза или HTTP статус и
+            описание ошибки, как get_forecast.
+        """
+        try:
+            weather = Weather(city, recheck)
+        except Weather.ArgumentError as ex:
+            return HTTPStatus.NOT_FOUND, {'city': city, 'error': str(ex)}
+        except Weather.ServerError as ex:
+            return HTTPStatus.BAD_GATEWAY, {'city': city, 'error': str(ex)}
+
+        try:
+            weather.set_current_params(current)
+        except Weather.ArgumentError as ex:
+            return HTTPStatus.BAD_REQUEST, {'city': city, 'error': str(ex)}
+
+        return weather
+
+    def get_encoded_forecast(
+            self,
+            city: str,
+            current: list[str],
+            recheck: bool = False,
+            ) -> tuple[HTTPStatus, bytes]:
+        """Получает прогноз погоды для города, закодированный в JSON.
+
+        Ответы с ошибками внешних сервисов не кэшируются, поэтому
+        следующий запрос того же города снова обращается к сервису.
+
+        Args:
+            city: Название города.
+            current: Требуемые параметры текущей погоды.
+            recheck: Искать город у Nominatim, даже если недавно он не
+                был найден. Ответ при этом обновляется в кэше.
+
+        Returns:
+            Возвращает HTTP статус и тело ответа.
+        """
+        key = (city.strip().lower(), tuple(current))
+
+        def load(recheck: bool) -> tuple[tuple[HTTPStatus, bytes],
+                                         float | None]:
+            status, forecast = self.get_forecast(city, current, recheck)
+            ttl = 0.0 if status == HTTPStatus.BAD_GATEWAY else None
+            return (status, encode(forecast)), ttl
+
+        if recheck:
+            response, ttl = load(recheck=True)
+
+            if ttl is None:
+                self.responses.set(key, response)
+
+            return response
+
+        return self.responses.get_or_load(key, lambda: load(recheck=False),
+                                          with_ttl=True)
+
+    def get_encoded_forecasts(
+            self,
+            cities: list[str],
+            current: list[str],
+            ) -> list[tuple[HTTPStatus, bytes]]:
+        """Получает прогнозы погоды для нескольких городов в JSON.
+
+        Сначала параллельно находятся все города, которых нет в кэше
+        ответов, затем их прогнозы запрашиваются пачками по
+        BATCH_CHUNK_SIZE точек через request_forecasts, поэтому к
+        Open-Meteo уходит по запросу на API для пачки, а не для города.
+        Ошибки передаются отдельно для каждого города, как у
+        get_encoded_forecast.
+
+        Args:
+            cities: Названия городов.
+            current: Требуемые параметры текущей погоды.
+
+        Returns:
+            Возвращает HTTP статусы и тела ответов в порядке городов.
+        """
+        keys = [(city.strip().lower(), tuple(current)) for city in cities]
+        responses = [self.responses.get(key) for key in keys]
+        missing = [index for index, response in enumerate(responses)
+                   if response is None]
+
+        results = self.executor.map(
+                lambda index: self.__create_weather(cities[index], current),
+                missing,
+                )
+
+        found = []
+        for index, result in zip(missing, results):
+            if isinstance(result, Weather):
+                found.append((index, result))
+            else:
+                status, error = result
+                responses[index] = (status, encode(error))
+
+        chunks = [found[start:start + BATCH_CHUNK_SIZE]
+                  for start in range(0, len(found), BATCH_CHUNK_SIZE)]
+        errors = self.executor.map(self.__request_chunk, chunks)
+
+        for chunk, error in zip(chunks, errors):
+            for index, weather in chunk:
+                if error is None:
+                    responses[index] = (HTTPStatus.OK,
+                                        encode(weather.to_dict()))
+                else:
+                    responses[index] = (HTTPStatus.BAD_GATEWAY,
+                                        encode({'city': cities[index],
+                                                'error': error}))
+
+        # Ответы с ошибками внешних сервисов не кэшируются.
+        for index in missing:
+            status, _ = responses[index]
+            if status != HTTPStatus.BAD_GATEWAY:
+                self.responses.set(keys[index], responses[index])
+
+        return responses
+
+    @staticmethod
+    def __request_chunk(chunk: list[tuple[int, Weather]]) -> str | None:
+        """Получает прогнозы для пачки городов одним запросом.
+
+        Args:
+            chunk: Номера городов в пакете и их объекты Weather.
+
+        Returns:
+            Возвращает None или описание ошибки внешнего сервиса.
+        """
+        try:
+            Weather.request_many([weather for _, weather in chunk])
+        except Weather.ServerError as ex:
+            return str(ex)
+
+        return None
+
+
+class WeatherRequestHandler(BaseHTTPRequestHandler):
+    """Класс, обрабатывающий HTTP запросы к WeatherService."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server: WeatherService
+
+    def do_GET(self) -> None:
+        started_at = time.perf_counter()
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        current = self.__get_current_params(query.get('current'))
+
+        if url.path == '/forecast':
+            cities = query.get('city')
+
+            if not cities:
+                self.__send_error('Не указан город')
+            else:
+                recheck = query.get('recheck', ['0'])[0] not in ('', '0')
+                status, body = self.server.get_encoded_forecast(
+                        cities[0], current, recheck)
+                self.__send(body, status)
+        elif url.path == '/batch':
+            self.__send_batch(query.get('city', []), current)
+        elif url.path == '/nearest':
+            self.__send_nearest(query)
+        elif url.path == '/changes':
+            self.__send_changes(query)
+        elif url.path == '/metrics':
+            self.__send(encode(self.server.get_metrics()))
+        else:
+            self.__send_error('Неизвестный адрес', HTTPStatus.NOT_FOUND)
+
+        self.server.record_latency(time.perf_counter() - started_at)
+
+    def do_POST(self) -> None:
+        started_at = time.perf_counter()
+        url = urlsplit(self.path)
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+
+        body = None
+        if length >= 0:
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                pass
+
+        if not isinstance(body, dict):
+            body = None
+
+        if length < 0:
+            # Границу тела запроса не найти, поэтому соединение нельзя
+            # использовать для следующих запросов.
+            self.close_connection = True
+            self.__send_error('Некорректная длина тела запроса')
+        elif url.path != '/batch':
+            self.__send_error('Неизвестный адрес', HTTPStatus.NOT_FOUND)
+        elif body is None:
+            self.__send_error('Некорректное тело запроса')
+        elif not self.__is_string_list(body.get('cities', [])):
+            self.__send_error('Поле cities должно быть списком строк')
+        elif body.get('current') is not None and (
+                not self.__is_string_list(body['current'])):
+            self.__send_error('Поле current должно быть списком строк')
+        else:
+            self.__send_batch(
+                    body.get('cities', []),
+                    self.__get_current_params(body.get('current')),
+                    )
+
+        self.server.record_latency(time.perf_counter() - started_at)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    @staticmethod
+    def __is_string_list(value: Any) -> bool:
+        return isinstance(value, list) and all(isinstance(item, str)
+                                               for item in value)
+
+    @staticmethod
+    def __get_current_params(params: list[str] | None) -> list[str]:
+        if not params:
+            return DEFAULT_CURRENT_PARAMS
+
+        return [param.strip() for value in params
+                for param in value.split(',') if param.strip()]
+
+    def __send_batch(self, cities: list[str], current: list[str]) -> None:
+        if len(cities) > MAX_BATCH_SIZE:
+            self.__send_error(f'Не больше {MAX_BATCH_SIZE} городов за запрос')
+            return
+
+        results = self.server.get_encoded_forecasts(cities, current)
+        self.__send(b'[' + b','.join(body for _, body in results) + b']')
+
+    def __send_nearest(self, query: dict[str, list[str]]) -> None:
+        try:
+            latitude = float(query['latitude'][0])
+            longitude = float(query['longitude'][0])
+        except (KeyError, ValueError):
+            self.__send_error('Укажите широту и долготу')
+            return
+
+        nearest = core.weather.FORECAST_CACHE.nearest(latitude, longitude)
+
+        if nearest is None:
+            self.__send_error('Рядом нет закэшированных прогнозов',
+                              HTTPStatus.NOT_FOUND)
+            return
+
+        distance, forecast = nearest
+        self.__send(encode({'distance_km': round(distance, 3),
+                            **forecast.to_dict()}))
+
+    def __send_changes(self, query: dict[str, list[str]]) -> None:
+        try:
+            after_id = int(query.get('after', ['0'])[0])
+            limit = int(query.get('limit', [str(MAX_CHANGES)])[0])
+        except ValueError:
+            self.__send_error('Некорректный номер изменения')
+            return
+
+        changes = core.weather.FORECAST_CACHE.get_changes(
+                after_id, max(1, min(limit, MAX_CHANGES)))
+        self.__send(encode({
+            'changes': [change.to_dict() for change in changes],
+            'last_id': changes[-1].id if changes else after_id,
+            }))
+
+    def __send_error(self, message: str,
+                     status: HTTPStatus = HTTPStatus.BAD_REQUEST) -> None:
+        self.__send(encode({'error': message}), status)
+
+    def __send(self, body: bytes, status: HTTPStatus = HTTPStatus.OK) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def encode(data: Any) -> bytes:
+    """Кодирует данные в JSON.
+
+    Args:
+        data: Данные.
+
+    Returns:
+        Возвращает тело ответа.
+    """
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def serve(host: str = '127.0.0.1', port: int = 8080) -> None:
+    """Запускает HTTP сервис и обслуживает запросы до прерывания.
+
+    Args:
+        host: Адрес.
+        port: Порт.
+    """
+    with WeatherService((host, port)) as service:
+        try:
+            service.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import datetime
+import sys
+from typing import Any
+
+CURRENT_FIELDS = (
+    'temperature_2m',
+    'apparent_temperature',
+    'relative_humidity_2m',
+    'precipitation',
+    'weather_code',
+    'pressure_msl',
+    'wind_speed_10m',
+    'wind_direction_10m',
+    )
+
+AIR_QUALITY_FIELDS = (
+    'european_aqi',
+    'pm10',
+    'pm2_5',
+    )
+
+MARINE_FIELDS = (
+    'wave_height',
+    'wave_direction',
+    'wave_period',
+    )
+
+# Текущие значения из дополнительных API Open-Meteo по источникам.
+SOURCE_FIELDS = {
+    'air_quality': AIR_QUALITY_FIELDS,
+    'marine': MARINE_FIELDS,
+    }
+
+ALL_CURRENT_FIELDS = (*CURRENT_FIELDS, *AIR_QUALITY_FIELDS, *MARINE_FIELDS)
+
+DAILY_FIELDS = (
+    'weather_code',
+    'temperature_2m_max',
+    'temperature_2m_min',
+    'precipitation_sum',
+    'wind_speed_10m_max',
+    )
+
+HOURLY_FIELDS = (
+    'temperature_2m',
+    'precipitation',
+    'wind_speed_10m',
+    )
+
+
+class WeatherSnapshot:
+    """Класс, описывающий неизменяемый разобранный ответ Open-Meteo.
+
+    Ответ разбирается один раз в типизированные поля: текущие значения
+    хранятся в отдельных слотах, дневной и почасовой прогнозы - в
+    кортежах. Объект не содержит словарей, занимает в несколько раз меньше
+    памяти, чем исходный JSON, и может без блокировок использоваться из
+    разных потоков. Переменные, не перечисленные в ALL_CURRENT_FIELDS,
+    DAILY_FIELDS и HOURLY_FIELDS, отбрасываются.
+
+    Текущие значения качества воздуха и волнения моря приходят из
+    отдельных API. Если источник не ответил, его поля равны None, а его
+    название записывается в unavailable.
+    """
+
+    __slots__ = (
+        'latitude',
+        'longitude',
+        'utc_offset_seconds',
+        'time',
+        *ALL_CURRENT_FIELDS,
+        'unavailable',
+        'daily_time',
+        *(f'daily_{name}' for name in DAILY_FIELDS),
+        'hourly_time',
+        *(f'hourly_{name}' for name in HOURLY_FIELDS),
+        )
+
+    latitude: float
+    longitude: float
+    utc_offset_seconds: int
+    time: str | None
+    temperature_2m: float | None
+    apparent_temperature: float | None
+    relative_humidity_2m: float | None
+    precipitation: float | None
+    weather_code: int | None
+    pressure_msl: float | None
+    wind_speed_10m: float | None
+    wind_direction_10m: float | None
+    european_aqi: float | None
+    pm10: float | None
+    pm2_5: float | None
+    wave_height: float | None
+    wave_direction: float | None
+    wave_period: float | None
+    unavailable: tuple[str, ...]
+    daily_time: tuple[str, ...]
+    daily_weather_code: tuple[int | None, ...]
+    daily_temperature_2m_max: tuple[float | None, ...]
+    daily_temperature_2m_min: tuple[float | None, ...]
+    daily_precipitation_sum: tuple[float | None, ...]
+    daily_wind_speed_10m_max: tuple[float | None, ...]
+    hourly_time: tuple[str, ...]
+    hourly_temperature_2m: tuple[float | None, ...]
+    hourly_precipitation: tuple[float | None, ...]
+    hourly_wind_speed_10m: tuple[float | None, ...]
+
+    def __init__(self, **fields: Any) -> None:
+        """Устанавливает атрибуты для объекта WeatherSnapshot.
+
+        Args:
+            fields: Значения слотов. Не переданные текущие значения равны
+                None, не переданные дневные и почасовые - пустому кортежу.
+        """
+        for name in self.__slots__:
+            if name.startswith(('daily_', 'hourly_')) or name == 'unavailable':
+                default = ()
+            elif name == 'utc_offset_seconds':
+                default = 0
+            else:
+                default = None
+            object.__setattr__(self, name, fields.pop(name, default))
+
+        if fields:
+            error_message = f'Неизвестные поля: {", ".join(fields)}'
+            raise TypeError(error_message)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError('WeatherSnapshot нельзя изменить')
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError('WeatherSnapshot нельзя изменить')
+
+    def __repr__(self) -> str:
+        return (f'WeatherSnapshot(latitude={self.latitude}, '
+                f'longitude={self.longitude}, time={self.time!r})')
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> WeatherSnapshot:
+        """Разбирает ответ Open-Meteo.
+
+        Args:
+            data: Декодированный JSON ответа.
+
+        Returns:
+            Возвращает снимок погоды.
+        """
+        current = data.get('current', {})
+        daily = data.get('daily', {})
+        hourly = data.get('hourly', {})
+
+        fields = {
+            'latitude': float(data['latitude']),
+            'longitude': float(data['longitude']),
+            'utc_offset_seconds': int(data.get('utc_offset_seconds', 0)),
+            'time': current.get('time'),
+            'unavailable': tuple(data.get('unavailable', ())),
+            'daily_time': tuple(sys.intern(date)
+                                for date in daily.get('time', ())),
+            'hourly_time': tuple(sys.intern(hour)
+                                 for hour in hourly.get('time', ())),
+            }
+
+        for name in ALL_CURRENT_FIELDS:
+            fields[name] = current.get(name)
+
+        for name in DAILY_FIELDS:
+            fields[f'daily_{name}'] = tuple(daily.get(name, ()))
+
+        for name in HOURLY_FIELDS:
+            fields[f'hourly_{name}'] = tuple(hourly.get(name, ()))
+
+        return cls(**fields)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Представляет снимок в формате ответа Open-Meteo.
+
+        Returns:
+            Возвращает словарь, пригодный для сериализации в JSON
+            и для обратного разбора методом from_dict.
+        """
+        current = {'time': self.time}
+        for name in ALL_CURRENT_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                current[name] = value
+
+        daily = {'time': list(self.daily_time)}
+        for name in DAILY_FIELDS:
+            values = getattr(self, f'daily_{name}')
+            if values:
+                daily[name] = list(values)
+
+        hourly = {'time': list(self.hourly_time)}
+        for name in HOURLY_FIELDS:
+            values = getattr(self, f'hourly_{name}')
+            if values:
+                hourly[name] = list(values)
+
+        return {
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'utc_offset_seconds': self.utc_offset_seconds,
+            'current': current,
+            'unavailable': list(self.unavailable),
+            'daily': daily,
+            'hourly': hourly,
+            }
+
+    def get_values(self) -> dict[tuple[str, int | None], float]:
+        """Получает числовые значения погодных переменных.
+
+        Returns:
+            Возвращает словарь, где ключ - пара (переменная, горизонт),
+            а горизонт равен None для текущих значений или номеру дня
+            прогноза (0 - сегодня).
+        """
+        values = {}
+        for name in ALL_CURRENT_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                values[(name, None)] = value
+
+        for name in DAILY_FIELDS:
+            for day, value in enumerate(getattr(self, f'daily_{name}')):
+                if value is not None:
+                    values[(name, day)] = value
+
+        return values
+
+    def get_unavailable_fields(self) -> frozenset[str]:
+        """Получает текущие переменные источников, которые не ответили.
+
+        Returns:
+            Возвращает названия переменных.
+        """
+        return frozenset(name for source in self.unavailable
+                         for name in SOURCE_FIELDS.get(source, ()))
+
+    def get_history_row(self, cell: str, fetched_at: float) -> tuple | None:
+        """Представляет текущие значения строкой таблицы weather_history.
+
+        Args:
+            cell: Геохэш ячейки.
+            fetched_at: Время получения ответа, секунды с начала эпохи.
+
+        Returns:
+            Возвращает строку таблицы или None, если в ответе нет текущих
+            значений.
+        """
+        if self.time is None:
+            return None
+
+        local_time = datetime.datetime.fromisoformat(self.time).replace(
+                tzinfo=datetime.timezone.utc)
+        observed_at = int(local_time.timestamp()) - self.utc_offset_seconds
+        return (cell, self.latitude, self.longitude, observed_at, fetched_at,
+                *(getattr(self, name) for name in CURRENT_FIELDS))
@@ -0,0 +1,377 @@
+from __future__ import annotations
+
+import json
+import math
+import threading
+import time
+from collections.abc import Callable, Iterable, Mapping
+
+from core import geohash
+from core.cache import TTLCache
+from core.db import DataBase
+from core.deltas import (CHANGE_RETENTION, DELTA_THRESHOLDS, ChangeFeed,
+                         ForecastChange, get_change, get_forecast_changes)
+from core.snapshot import WeatherSnapshot
+
+
+def save_snapshots(
+        database: DataBase,
+        params: str,
+        snapshots: Iterable[tuple[str, float, float, WeatherSnapshot]],
+        fetched_at: float,
+        thresholds: Mapping[str, float] = DELTA_THRESHOLDS,
+        ) -> list[ForecastChange]:
+    """Сохраняет новые прогнозы ячеек вместе с историей и изменениями.
+
+    Каждый прогноз сравнивается с предыдущим прогнозом ячейки, после чего
+    прогнозы, строки истории и существенные изменения записываются в базу
+    одной транзакцией. В той же транзакции удаляются изменения старше
+    CHANGE_RETENTION.
+
+    Args:
+        database: База данных.
+        params: Параметры запроса без координат в виде строки.
+        snapshots: Геохэши ячеек, координаты их центров и снимки погоды.
+        fetched_at: Время получения прогнозов.
+        thresholds: Минимальные существенные изменения по переменным.
+
+    Returns:
+        Возвращает сохранённые изменения прогнозов.
+    """
+    forecasts = []
+    history = []
+    changes = []
+    for cell, latitude, longitude, snapshot in snapshots:
+        previous = database.get_cached_forecast(cell, params, 0.0)
+        forecasts.append((cell, params, latitude, longitude, fetched_at,
+                          json.dumps(snapshot.to_dict())))
+
+        history_row = snapshot.get_history_row(cell, fetched_at)
+        if history_row is not None:
+            history.append(history_row)
+
+        change = get_change(cell, None if previous is None else previous[1],
+                            snapshot, fetched_at, thresholds)
+        if change is not None:
+            changes.append(change)
+
+    database.save_cached_forecasts(
+            forecasts,
+            history,
+            [change.get_row() for change in changes],
+            fetched_at - CHANGE_RETENTION,
+            )
+    return changes
+
+
+class SpatialForecastCache:
+    """Класс, описывающий кэш прогнозов по ячейкам координатной сетки.
+
+    Координаты квантуются до ячейки геохэша заданной точности, поэтому
+    города, районы и разные написания одного названия, попадающие в одну
+    ячейку, разделяют одну запись. Записи хранятся в памяти и в таблице
+    forecast_cache, где первичный ключ по геохэшу служит пространственным
+    индексом для поиска ближайшего закэшированного прогноза.
+
+    Каждый загруженный с сервера прогноз сравнивается с предыдущим
+    прогнозом ячейки. Существенные изменения сохраняются в таблицу
+    forecast_change и рассылаются подписчикам атрибута changes.
+
+    Прогнозы, для которых не ответил один из дополнительных API, живут
+    в кэше только degraded_ttl секунд, чтобы недостающие значения скоро
+    были запрошены снова.
+    """
+
+    def __init__(self, ttl: float, precision: int = 5,
+                 path: str = 'db.sql', maxsize: int = 10000,
+                 thresholds: Mapping[str, float] = DELTA_THRESHOLDS,
+                 degraded_ttl: float = 5 * 60) -> None:
+        """Устанавливает атрибуты для объекта SpatialForecastCache.
+
+        Args:
+            ttl: Срок жизни прогноза в секундах.
+            precision: Длина геохэша. При точности 5 ячейка около 5x5 км,
+                что соответствует шагу сетки моделей Open-Meteo.
+            path: Путь к базе данных.
+            maxsize: Максимальное количество записей в памяти.
+            thresholds: Минимальные существенные изменения по переменным.
+            degraded_ttl: Срок жизни неполного прогноза в секундах.
+        """
+        self.__ttl = ttl
+        self.__degraded_ttl = min(ttl, degraded_ttl)
+        self.__precision = precision
+        self.__path = path
+        self.__memory = TTLCache(ttl=ttl, maxsize=maxsize)
+        self.__local = threading.local()
+        self.__thresholds = thresholds
+        self.changes = ChangeFeed()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.__memory)
+
+    def __get_database(self) -> DataBase:
+        """Получает соединение с базой данных для текущего потока.
+
+        Returns:
+            Возвращает базу данных.
+        """
+        database = getattr(self.__local, 'database', None)
+
+        if database is None:
+            database = DataBase(self.__path)
+            self.__local.database = database
+
+        return database
+
+    def get_cell(self, latitude: float,
+                 longitude: float) -> tuple[str, float, float]:
+        """Квантует координаты до ячейки кэша.
+
+        Args:
+            latitude: Широта.
+            longitude: Долгота.
+
+        Returns:
+            Возвращает геохэш ячейки и координаты её центра.
+        """
+        cell = geohash.encode(latitude, longitude, self.__precision)
+        cell_latitude, cell_longitude, _, _ = geohash.decode(cell)
+        return cell, cell_latitude, cell_longitude
+
+    def get_or_load(
+            self,
+            latitude: float,
+            longitude: float,
+            params: str,
+            loader: Callable[[float, float], WeatherSnapshot],
+            ) -> WeatherSnapshot:
+        """Получает прогноз для ячейки, а при промахе загружает его.
+
+        Args:
+            latitude: Широта.
+            longitude: Долгота.
+            params: Параметры запроса без координат в виде строки.
+            loader: Функция, загружающая прогноз по координатам центра
+                ячейки.
+
+        Returns:
+            Возвращает снимок погоды.
+        """
+        cell, cell_latitude, cell_longitude = self.get_cell(latitude,
+                                                            longitude)
+        key = (cell, params)
+        missing = object()
+        result = self.__memory.get(key, missing)
+
+        if result is not missing:
+            self.hits += 1
+            return result
+
+        return self.__memory.get_or_load(
+                key,
+                lambda: self.__load(cell, params, cell_latitude,
+                                    cell_longitude, loader),
+                with_ttl=True,
+                )
+
+    def __load(
+            self,
+            cell: str,
+            params: str,
+            latitude: float,
+            longitude: float,
+            loader: Callable[[float, float], WeatherSnapshot],
+            ) -> tuple[WeatherSnapshot, float]:
+        """Загружает прогноз из базы данных или с сервера.
+
+        Returns:
+            Возвращает снимок погоды и оставшийся срок его жизни в
+            секундах.
+        """
+        database = self.__get_database()
+        stored = self.__get_stored(database, cell, params)
+
+        if stored is not None:
+            self.hits += 1
+            return stored
+
+        self.misses += 1
+        snapshot = loader(latitude, longitude)
+        changes = save_snapshots(database, params,
+                                 [(cell, latitude, longitude, snapshot)],
+                                 time.time(), self.__thresholds)
+
+        for change in changes:
+            self.changes.publish(change)
+
+        return snapshot, self.__get_ttl(snapshot)
+
+    def get_or_load_many(
+            self,
+            locations: list[tuple[float, float]],
+            params: str,
+            loader: Callable[[list[tuple[float, float]]],
+                             list[WeatherSnapshot]],
+            ) -> list[WeatherSnapshot]:
+        """Получает прогнозы для нескольких точек, загружая промахи разом.
+
+        Прогнозы ищутся в памяти и в базе данных, а для оставшихся ячеек
+        загружаются одним вызовом loader и сохраняются одной транзакцией.
+
+        Args:
+            locations: Широты и долготы точек.
+            params: Параметры запроса без координат в виде строки.
+            loader: Функция, загружающая прогнозы по координатам центров
+                ячеек.
+
+        Returns:
+            Возвращает снимки погоды в порядке точек.
+        """
+        cells = [self.get_cell(latitude, longitude)
+                 for latitude, longitude in locations]
+        database = self.__get_database()
+        missing = object()
+
+        snapshots = {}
+        misses = {}
+        for cell, cell_latitude, cell_longitude in cells:
+            if cell in snapshots or cell in misses:
+                continue
+
+            key = (cell, params)
+            snapshot = self.__memory.get(key, missing)
+
+            if snapshot is missing:
+                stored = self.__get_stored(database, cell, params)
+
+                if stored is None:
+                    misses[cell] = (cell_latitude, cell_longitude)
+                    continue
+
+                snapshot, ttl = stored
+                self.__memory.set(key, snapshot, ttl)
+
+            self.hits += 1
+            snapshots[cell] = snapshot
+
+        if misses:
+            self.misses += len(misses)
+            loaded = [(cell, latitude, longitude, snapshot)
+                      for (cell, (latitude, longitude)), snapshot
+                      in zip(misses.items(), loader(list(misses.values())))]
+            changes = save_snapshots(database, params, loaded, time.time(),
+                                     self.__thresholds)
+
+            for cell, _, _, snapshot in loaded:
+                self.__memory.set((cell, params), snapshot,
+                                  self.__get_ttl(snapshot))
+                snapshots[cell] = snapshot
+
+            for change in changes:
+                self.changes.publish(change)
+
+        return [snapshots[cell] for cell, _, _ in cells]
+
+    def __get_stored(
+            self,
+            database: DataBase,
+            cell: str,
+            params: str,
+            ) -> tuple[WeatherSnapshot, float] | None:
+        """Ищет в базе данных ещё не устаревший прогноз ячейки.
+
+        Returns:
+            Возвращает снимок погоды и оставшийся срок его жизни в
+            секундах или None.
+        """
+        now = time.time()
+        cached = database.get_cached_forecast(cell, params, now - self.__ttl)
+
+        if cached is None:
+            return None
+
+        fetched_at, payload = cached
+        snapshot = WeatherSnapshot.from_dict(json.loads(payload))
+        # В памяти запись живёт столько, сколько ей осталось в базе.
+        ttl = fetched_at + self.__get_ttl(snapshot) - now
+
+        if ttl <= 0:
+            return None
+
+        return snapshot, ttl
+
+    def __get_ttl(self, snapshot: WeatherSnapshot) -> float:
+        return self.__degraded_ttl if snapshot.unavailable else self.__ttl
+
+    def get_changes(self, after_id: int = 0,
+                    limit: int = 1000) -> list[ForecastChange]:
+        """Получает сохранённые изменения прогнозов всех процессов.
+
+        Args:
+            after_id: Номер последнего прочитанного изменения.
+            limit: Максимальное количество изменений.
+
+        Returns:
+            Возвращает изменения в порядке сохранения.
+        """
+        return get_forecast_changes(self.__get_database(), after_id, limit)
+
+    def nearest(
+            self,
+            latitude: float,
+            longitude: float,
+            params: str | None = None,
+            max_distance_km: float = 50.0,
+            ) -> tuple[float, WeatherSnapshot] | None:
+        """Ищет ближайший к точке закэшированный прогноз.
+
+        Поиск начинается с ячейки точки и её соседей и переходит к всё более
+        крупным ячейкам, пока найденный прогноз не окажется ближе размера
+        ячейки, то есть заведомо ближайшим.
+
+        Args:
+            latitude: Широта.
+            longitude: Долгота.
+            params: Параметры запроса или None для любых параметров.
+            max_distance_km: Максимальное расстояние до прогноза.
+
+        Returns:
+            Возвращает расстояние в километрах и снимок погоды или None.
+        """
+        database = self.__get_database()
+        fetched_after = time.time() - self.__ttl
+
+        best = None
+        for precision in range(self.__precision, 0, -1):
+            cell = geohash.encode(latitude, longitude, precision)
+            _, _, height, width = geohash.decode(cell)
+            cell_size_km = min(
+                    height,
+                    width * math.cos(math.radians(latitude)),
+                    ) * math.pi * geohash.EARTH_RADIUS_KM / 180
+
+            for neighbour in geohash.neighbours(cell):
+                rows = database.get_cached_forecasts_by_prefix(neighbour,
+                                                               fetched_after)
+                for _, row_params, row_latitude, row_longitude, payload in (
+                        rows):
+                    if params is not None and row_params != params:
+                        continue
+
+                    distance = geohash.distance_km(latitude, longitude,
+                                                   row_latitude, row_longitude)
+                    if best is None or distance < best[0]:
+                        best = (distance, payload)
+
+            if best is not None and best[0] <= cell_size_km:
+                break
+
+            if cell_size_km > max_distance_km:
+                break
+
+        if best is None or best[0] > max_distance_km:
+            return None
+
+        return best[0], WeatherSnapshot.from_dict(json.loads(best[1]))
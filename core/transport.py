@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, Future, ThreadPoolExecutor,
+                                wait)
+from typing import Any, Protocol
+
+import requests
+
+from core.rate_limiter import RateLimiter
+
+
+class TransportError(Exception):
+    """Класс, описывающий ошибку сети или истечение срока запроса."""
+    pass
+
+
+class TransportResponse:
+    """Класс, описывающий ответ на HTTP запрос."""
+
+    __slots__ = ('status_code', 'content')
+
+    def __init__(self, status_code: int, content: bytes) -> None:
+        """Устанавливает атрибуты для объекта TransportResponse.
+
+        Args:
+            status_code: Код ответа.
+            content: Тело ответа.
+        """
+        self.status_code = status_code
+        self.content = content
+
+    def json(self) -> Any:
+        """Декодирует тело ответа из JSON.
+
+        Returns:
+            Возвращает декодированные данные.
+        """
+        return json.loads(self.content)
+
+
+class Transport(Protocol):
+    """Интерфейс транспорта, выполняющего HTTP запросы."""
+
+    def get(self, url: str, params: dict[str, Any] | None = None,
+            headers: dict[str, str] | None = None,
+            timeout: float | None = None) -> TransportResponse:
+        ...
+
+
+class HttpTransport:
+    """Класс, выполняющий HTTP запросы через общий пул соединений."""
+
+    def __init__(self, session: requests.Session) -> None:
+        """Устанавливает атрибуты для объекта HttpTransport.
+
+        Args:
+            session: Сессия requests с пулом соединений.
+        """
+        self.__session = session
+
+    def get(self, url: str, params: dict[str, Any] | None = None,
+            headers: dict[str, str] | None = None,
+            timeout: float | None = None) -> TransportResponse:
+        """Выполняет GET запрос.
+
+        Args:
+            url: Адрес.
+            params: Параметры запроса.
+            headers: Заголовки.
+            timeout: Максимальное время запроса в секундах.
+
+        Returns:
+            Возвращает ответ.
+        """
+        try:
+            response = self.__session.get(url, params=params, headers=headers,
+                                          timeout=timeout)
+        except requests.RequestException as ex:
+            raise TransportError(str(ex)) from ex
+
+        return TransportResponse(response.status_code, response.content)
+
+
+class RateLimitedTransport:
+    """Класс, ограничивающий частоту запросов другого транспорта.
+
+    Ожидание очереди не входит в бюджет времени запроса: бюджет
+    отсчитывается с момента отправки запроса, поэтому длинная очередь
+    замедляет запросы, но не приводит к ошибке.
+    """
+
+    def __init__(self, transport: Transport,
+                 rate_limiter: RateLimiter) -> None:
+        """Устанавливает атрибуты для объекта RateLimitedTransport.
+
+        Args:
+            transport: Транспорт, выполняющий запросы.
+            rate_limiter: Ограничитель частоты запросов.
+        """
+        self.__transport = transport
+        self.__rate_limiter = rate_limiter
+
+    def get(self, url: str, params: dict[str, Any] | None = None,
+            headers: dict[str, str] | None = None,
+            timeout: float | None = None) -> TransportResponse:
+        self.__rate_limiter.acquire()
+        return self.__transport.get(url, params=params, headers=headers,
+                                    timeout=timeout)
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Получает метрики транспорта, который ограничивается.
+
+        Returns:
+            Возвращает метрики или пустой словарь, если их нет.
+        """
+        get_metrics = getattr(self.__transport, 'get_metrics', None)
+        return {} if get_metrics is None else get_metrics()
+
+
+class HedgedTransport:
+    """Класс, ограничивающий время запроса и дублирующий медленные запросы.
+
+    Каждый запрос получает бюджет времени. Если первая попытка не ответила
+    за наблюдаемый 95-й процентиль задержки, отправляется вторая, и
+    используется ответ, пришедший первым. Доля продублированных запросов
+    ограничена max_hedge_ratio, чтобы при общей деградации сервиса не
+    удваивать нагрузку на него.
+    """
+
+    def __init__(self, transport: Transport, timeout: float = 10.0,
+                 max_hedge_ratio: float = 0.1, min_samples: int = 20,
+                 workers: int = 32) -> None:
+        """Устанавливает атрибуты для объекта HedgedTransport.
+
+        Args:
+            transport: Транспорт, выполняющий запросы.
+            timeout: Бюджет времени запроса по умолчанию в секундах.
+            max_hedge_ratio: Максимальная доля продублированных запросов.
+            min_samples: Сколько задержек нужно накопить, прежде чем
+                начинать дублировать запросы.
+            workers: Количество потоков для попыток.
+        """
+        self.__transport = transport
+        self.__timeout = timeout
+        self.__max_hedge_ratio = max_hedge_ratio
+        self.__min_samples = min_samples
+        self.__executor = ThreadPoolExecutor(max_workers=workers)
+        self.__latencies = deque(maxlen=1000)
+        self.__hedge_delay: float | None = None
+        self.__lock = threading.Lock()
+        self.__requests = 0
+        self.__hedges = 0
+        self.__hedge_wins = 0
+        self.__timeouts = 0
+
+    def get(self, url: str, params: dict[str, Any] | None = None,
+            headers: dict[str, str] | None = None,
+            timeout: float | None = None) -> TransportResponse:
+        """Выполняет GET запрос с ограничением времени и дублированием.
+
+        Args:
+            url: Адрес.
+            params: Параметры запроса.
+            headers: Заголовки.
+            timeout: Бюджет времени запроса в секундах.
+
+        Returns:
+            Возвращает первый успешный ответ.
+        """
+        if timeout is None:
+            timeout = self.__timeout
+
+        deadline = time.monotonic() + timeout
+
+        with self.__lock:
+            self.__requests += 1
+            hedge_delay = self.__hedge_delay
+
+        primary = self.__submit(url, params, headers, deadline)
+        attempts = [primary]
+
+        if hedge_delay is not None:
+            wait(attempts,
+                 timeout=min(hedge_delay, self.__remaining(deadline)))
+
+            if not primary.done() and self.__acquire_hedge():
+                attempts.append(self.__submit(url, params, headers, deadline))
+
+        pending = set(attempts)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=self.__remaining(deadline),
+                                 return_when=FIRST_COMPLETED)
+
+            if not done:
+                break
+
+            for attempt in done:
+                try:
+                    response, latency = attempt.result()
+                except TransportError as ex:
+                    error = ex
+                    continue
+
+                self.__record(latency, hedged=attempt is not primary)
+                return response
+
+        if error is not None and not pending:
+            raise error
+
+        with self.__lock:
+            self.__timeouts += 1
+
+        raise TransportError('Превышено время ожидания ответа')
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Получает метрики транспорта.
+
+        Returns:
+            Возвращает количество запросов, долю продублированных запросов
+            и долю побед дублей, количество тайм-аутов и задержку p95.
+        """
+        with self.__lock:
+            requests_count = self.__requests or 1
+            return {
+                'requests': self.__requests,
+                'hedges': self.__hedges,
+                'hedge_rate': round(self.__hedges / requests_count, 4),
+                'hedge_wins': self.__hedge_wins,
+                'hedge_win_rate': round(
+                        self.__hedge_wins / (self.__hedges or 1), 4),
+                'timeouts': self.__timeouts,
+                'hedge_delay_ms': (None if self.__hedge_delay is None
+                                   else round(self.__hedge_delay * 1000, 3)),
+                }
+
+    def __submit(self, url: str, params: dict[str, Any] | None,
+                 headers: dict[str, str] | None,
+                 deadline: float) -> Future:
+        return self.__executor.submit(self.__attempt, url, params, headers,
+                                      deadline)
+
+    def __attempt(self, url: str, params: dict[str, Any] | None,
+                  headers: dict[str, str] | None,
+                  deadline: float) -> tuple[TransportResponse, float]:
+        """Выполняет одну попытку запроса в пределах оставшегося бюджета.
+
+        Returns:
+            Возвращает ответ и длительность попытки в секундах.
+        """
+        remaining = self.__remaining(deadline)
+
+        if remaining <= 0:
+            raise TransportError('Превышено время ожидания ответа')
+
+        started_at = time.monotonic()
+        response = self.__transport.get(url, params=params, headers=headers,
+                                        timeout=remaining)
+        return response, time.monotonic() - started_at
+
+    def __acquire_hedge(self) -> bool:
+        with self.__lock:
+            if self.__hedges >= self.__max_hedge_ratio * self.__requests:
+                return False
+
+            self.__hedges += 1
+            return True
+
+    def __record(self, latency: float, hedged: bool) -> None:
+        with self.__lock:
+            self.__latencies.append(latency)
+
+            if hedged:
+                self.__hedge_wins += 1
+
+            if len(self.__latencies) < self.__min_samples:
+                return
+
+            # Процентиль пересчитывается не на каждый ответ, а раз в 10.
+            if self.__hedge_delay is None or self.__requests % 10 == 0:
+                latencies = sorted(self.__latencies)
+                self.__hedge_delay = latencies[int(len(latencies) * 0.95)]
+
+    @staticmethod
+    def __remaining(deadline: float) -> float:
+        return max(0.0, deadline - time.monotonic())
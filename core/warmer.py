@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import sqlite3
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import core.weather
+from core.db import DataBase
+from core.favourites import get_favourite_locations
+from core.rate_limiter import RateLimiter
+from core.replay import replay
+from core.spatial_cache import save_snapshots
+from core.transport import HttpTransport
+from core.weather import (FORECAST_PARAMS_KEY, FORECAST_RATE, Weather,
+                          fetch_forecasts, set_base_transport)
+
+WARM_INTERVAL = 50 * 60
+BATCH_SIZE = 50
+# Ошибки одной пачки: сбой сервера, некорректный ответ и занятая или
+# повреждённая база данных. Пачка считается неудачной, шард продолжает
+# работу со следующей пачки.
+BATCH_ERRORS = (Weather.ServerError, ValueError, KeyError, TypeError,
+                sqlite3.Error)
+
+
+@dataclass(frozen=True)
+class ShardProgress:
+    """Класс, описывающий прогресс обновления одного шарда.
+
+    Attributes:
+        shard: Номер шарда.
+        done: Сколько ячеек обновлено.
+        failed: Сколько ячеек не удалось обновить.
+        total: Сколько ячеек в шарде.
+        lag: Сколько секунд прошло с запланированного начала обновления.
+        error: Последняя ошибка шарда или None.
+    """
+
+    shard: int
+    done: int
+    failed: int
+    total: int
+    lag: float
+    error: str | None = None
+
+
+def collect_cells(database: DataBase) -> list[tuple[str, float, float]]:
+    """Собирает ячейки кэша для всех известных городов.
+
+    Любимые города без координат геокодируются и сохраняются в таблицу
+    city_location. Города из одной ячейки схлопываются в одну запись.
+
+    Args:
+        database: База данных.
+
+    Returns:
+        Возвращает геохэши ячеек и координаты их центров.
+    """
+    get_favourite_locations(database)
+    locations = {name: (latitude, longitude) for name, latitude, longitude
+                 in database.get_all_city_locations()}
+
+    cells = {}
+    for latitude, longitude in locations.values():
+        cell, cell_latitude, cell_longitude = (
+            core.weather.FORECAST_CACHE.get_cell(latitude, longitude))
+        cells[cell] = (cell_latitude, cell_longitude)
+
+    return [(cell, latitude, longitude)
+            for cell, (latitude, longitude) in sorted(cells.items())]
+
+
+def warm_shard(
+        shard: int,
+        cells: list[tuple[str, float, float]],
+        path: str,
+        batch_size: int,
+        rate: float,
+        scheduled_at: float,
+        progress: multiprocessing.Queue,
+        replay_path: str | None = None,
+        replay_timing: bool = False,
+        ) -> ShardProgress:
+    """Обновляет прогнозы одного шарда в отдельном процессе.
+
+    Прогнозы запрашиваются пачками по batch_size точек за запрос, каждая
+    пачка вместе с историей и изменениями прогнозов записывается в базу
+    одной транзакцией. Ошибка пачки не прерывает обновление шарда,
+    её ячейки учитываются как неудачные.
+
+    Args:
+        shard: Номер шарда.
+        cells: Ячейки шарда.
+        path: Путь к базе данных.
+        batch_size: Количество точек в одном запросе.
+        rate: Допустимое количество запросов в секунду для этого шарда.
+        scheduled_at: Запланированное время начала обновления.
+        progress: Очередь для отчётов о прогрессе.
+        replay_path: Архив, из которого воспроизводятся ответы, или None
+            для запросов к сети.
+        replay_timing: Воспроизводить ли записанные задержки.
+
+    Returns:
+        Возвращает итоговый прогресс шарда.
+    """
+    # Процесс запущен через spawn и не наследует транспорт родителя.
+    if replay_path is not None:
+        replay(replay_path, replay_timing)
+    else:
+        core.weather.FORECAST_RATE_LIMITER = RateLimiter(rate=rate)
+        set_base_transport(HttpTransport(core.weather.SESSION))
+    database = DataBase(path)
+
+    done = failed = 0
+    error = None
+    for start in range(0, len(cells), batch_size):
+        batch = cells[start:start + batch_size]
+
+        try:
+            snapshots = fetch_forecasts([(latitude, longitude)
+                                         for _, latitude, longitude in batch])
+            save_snapshots(
+                    database,
+                    FORECAST_PARAMS_KEY,
+                    [(cell, latitude, longitude, snapshot)
+                     for (cell, latitude, longitude), snapshot
+                     in zip(batch, snapshots)],
+                    time.time(),
+                    )
+        except BATCH_ERRORS as batch_error:
+            failed += len(batch)
+            error = f'{type(batch_error).__name__}: {batch_error}'
+        else:
+            done += len(batch)
+
+        shard_progress = ShardProgress(shard=shard, done=done, failed=failed,
+                                       total=len(cells),
+                                       lag=time.time() - scheduled_at,
+                                       error=error)
+        progress.put(shard_progress)
+
+    return ShardProgress(shard=shard, done=done, failed=failed,
+                         total=len(cells), lag=time.time() - scheduled_at,
+                         error=error)
+
+
+def warm(
+        path: str = 'db.sql',
+        processes: int | None = None,
+        batch_size: int = BATCH_SIZE,
+        report: Callable[[ShardProgress], None] = print,
+        replay_path: str | None = None,
+        replay_timing: bool = False,
+        ) -> list[ShardProgress]:
+    """Однократно обновляет кэш прогнозов для всех известных городов.
+
+    Ячейки делятся на шарды по числу процессов, общий лимит запросов
+    к Open-Meteo делится между шардами поровну.
+
+    Запись запросов в архив не поддерживается, так как запросы
+    выполняются в нескольких процессах. Воспроизведение архива
+    включается в каждом процессе, геокодирование в текущем процессе
+    должно быть переключено на архив заранее, см. core.replay.replay.
+
+    Args:
+        path: Путь к базе данных.
+        processes: Количество процессов, по умолчанию по числу ядер.
+        batch_size: Количество точек в одном запросе.
+        report: Функция, получающая отчёты о прогрессе шардов.
+        replay_path: Архив, из которого воспроизводятся ответы, или None
+            для запросов к сети.
+        replay_timing: Воспроизводить ли записанные задержки.
+
+    Returns:
+        Возвращает итоговый прогресс каждого шарда.
+    """
+    scheduled_at = time.time()
+    cells = collect_cells(DataBase(path))
+    shards = max(1, min(processes or os.cpu_count() or 1, len(cells)))
+
+    context = multiprocessing.get_context('spawn')
+    with context.Manager() as manager, context.Pool(shards) as pool:
+        progress = manager.Queue()
+        results = [
+            pool.apply_async(warm_shard, (
+                shard, cells[shard::shards], path, batch_size,
+                FORECAST_RATE / shards, scheduled_at, progress,
+                replay_path, replay_timing,
+                ))
+            for shard in range(shards)
+            ]
+
+        while not all(result.ready() for result in results):
+            while not progress.empty():
+                report(progress.get())
+            time.sleep(0.5)
+
+        while not progress.empty():
+            report(progress.get())
+
+        return [result.get() for result in results]
+
+
+def run_daemon(
+        path: str = 'db.sql',
+        processes: int | None = None,
+        interval: float = WARM_INTERVAL,
+        batch_size: int = BATCH_SIZE,
+        report: Callable[[ShardProgress], None] = print,
+        replay_path: str | None = None,
+        replay_timing: bool = False,
+        ) -> None:
+    """Обновляет кэш прогнозов каждые interval секунд до прерывания.
+
+    Интервал по умолчанию меньше срока жизни кэша FORECAST_CACHE_TTL,
+    поэтому потребители всегда находят свежие данные.
+
+    Args:
+        path: Путь к базе данных.
+        processes: Количество процессов, по умолчанию по числу ядер.
+        interval: Период обновления в секундах.
+        batch_size: Количество точек в одном запросе.
+        report: Функция, получающая отчёты о прогрессе шардов.
+        replay_path: Архив, из которого воспроизводятся ответы, или None
+            для запросов к сети.
+        replay_timing: Воспроизводить ли записанные задержки.
+    """
+    while True:
+        started_at = time.time()
+        warm(path, processes, batch_size, report, replay_path, replay_timing)
+        time.sleep(max(0.0, started_at + interval - time.time()))
@@ -1,7 +1,29 @@
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any
+
 import requests
 
 from fake_useragent import UserAgent
+from geopy.adapters import BaseSyncAdapter
+from geopy.exc import GeocoderServiceError, GeopyError
 from geopy.geocoders import Nominatim
+from requests.adapters import HTTPAdapter
+
+from core.cache import TTLCache
+from core.negative_cache import NegativeCache
+from core.rate_limiter import RateLimiter
+from core.snapshot import (AIR_QUALITY_FIELDS, ALL_CURRENT_FIELDS,
+                           CURRENT_FIELDS, DAILY_FIELDS, HOURLY_FIELDS,
+                           MARINE_FIELDS, WeatherSnapshot)
+from core.spatial_cache import SpatialForecastCache
+from core.transport import (HedgedTransport, HttpTransport,
+                            RateLimitedTransport, Transport, TransportError,
+                            TransportResponse)
 
 WEATHER_INTERPRETATION_CODES = {
     0: 'Ясно',
@@ -44,10 +66,89 @@ MONTH_INTERPRETATION_CODES = {
     '07': 'Июл',
     '08': 'Авг',
     '09': 'Сен',
+    '10': 'Окт',
     '11': 'Ноя',
     '12': 'Дек',
     }
 
+# Политика использования Nominatim допускает не больше 1 запроса в секунду.
+GEOCODE_RATE_LIMITER = RateLimiter(rate=1.0)
+FORECAST_RATE = 10.0
+FORECAST_RATE_LIMITER = RateLimiter(rate=FORECAST_RATE, burst=10)
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """Класс, описывающий запрос к одному API Open-Meteo.
+
+    Attributes:
+        name: Название источника, как в SOURCE_FIELDS.
+        url: Адрес.
+        params: Параметры запроса без координат.
+    """
+
+    name: str
+    url: str
+    params: dict[str, Any]
+
+
+# Запрашиваются все переменные, которые хранит WeatherSnapshot, чтобы один
+# закэшированный ответ подходил любому набору отображаемых параметров.
+FORECAST_PARAMS = {
+    'timezone': 'auto',
+    'forecast_days': 16,
+    'wind_speed_unit': 'ms',
+    'daily': list(DAILY_FIELDS),
+    'hourly': list(HOURLY_FIELDS),
+    'current': list(CURRENT_FIELDS),
+    }
+
+# План запросов для города: первый запрос обязателен, остальные выполняются
+# параллельно с ним, и их ошибки не мешают получить прогноз.
+ENDPOINTS = (
+    Endpoint('forecast', 'https://api.open-meteo.com/v1/forecast',
+             FORECAST_PARAMS),
+    Endpoint('air_quality',
+             'https://air-quality-api.open-meteo.com/v1/air-quality',
+             {'timezone': 'auto', 'current': list(AIR_QUALITY_FIELDS)}),
+    Endpoint('marine', 'https://marine-api.open-meteo.com/v1/marine',
+             {'timezone': 'auto', 'current': list(MARINE_FIELDS)}),
+    )
+FORECAST_PARAMS_KEY = json.dumps(
+        {endpoint.name: endpoint.params for endpoint in ENDPOINTS},
+        sort_keys=True,
+        )
+ENDPOINT_EXECUTOR = ThreadPoolExecutor(max_workers=32)
+
+# Модели Open-Meteo обновляются не чаще раза в час.
+FORECAST_CACHE_TTL = 60 * 60
+
+# Неизвестные Nominatim названия запоминаются ненадолго: база OpenStreetMap
+# пополняется, а опечатки обычно повторяются сразу.
+UNKNOWN_CITY_TTL = 10 * 60
+
+# Общие для всех объектов Weather кэши и пул соединений.
+GEOCODE_CACHE = TTLCache(ttl=24 * 60 * 60)
+UNKNOWN_CITY_CACHE = NegativeCache(ttl=UNKNOWN_CITY_TTL)
+FORECAST_CACHE = SpatialForecastCache(ttl=FORECAST_CACHE_TTL)
+# Точки вне зоны покрытия дополнительных API: ключ - (название API,
+# широта, долгота). Такие точки не запрашиваются у этого API повторно.
+NO_COVERAGE_CACHE = TTLCache(ttl=24 * 60 * 60)
+# Причина в ответе 400, с которой Open-Meteo отказывается отвечать для
+# точки вне зоны покрытия модели. Остальные ответы 400 считаются ошибкой.
+NO_COVERAGE_REASON = 'No data is available for this location'
+
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+# Бюджеты времени на запросы в секундах.
+FORECAST_TIMEOUT = 10.0
+GEOCODE_TIMEOUT = 5.0
+
+# Транспорты запросов к Open-Meteo и Nominatim, см. set_base_transport.
+TRANSPORT: RateLimitedTransport | HedgedTransport
+GEOCODE_TRANSPORT: Transport
+
 
 class Weather:
     """Класс, описывающий погоду."""
@@ -60,34 +161,26 @@ class Weather:
         """Класс, описывающий ошибку при получении координат города."""
         pass
 
-    URL = 'https://api.open-meteo.com/v1/forecast'
+    class CoverageError(ServerError):
+        """Класс, описывающий отказ сервера отвечать для координат."""
+        pass
 
-    def __init__(self, city: str) -> None:
+    URL = ENDPOINTS[0].url
+
+    def __init__(self, city: str, recheck: bool = False) -> None:
         """Устанавливает атрибуты для объекта Weather.
 
         Args:
             city: Название города.
+            recheck: Искать город у Nominatim, даже если недавно он не
+                был найден.
         """
 
         self.__city = city
 
-        latitude, longitude = self.__get_geolocation()
-        self.__params = {
-            'latitude': latitude,
-            'longitude': longitude,
-            'timezone': 'auto',
-            'forecast_days': 4,
-            'wind_speed_unit': 'ms',
-            'daily': [
-                'weather_code',
-                'temperature_2m_max',
-                'temperature_2m_min',
-                ],
-            'current': [],
-            }
-
+        self.__latitude, self.__longitude = self.__get_geolocation(recheck)
         self.__current_params = []
-        self.__last_result = None
+        self.__snapshot: WeatherSnapshot | None = None
 
     def get_city(self) -> str:
         """Получает текущий город.
@@ -97,52 +190,101 @@ class Weather:
         """
         return self.__city
 
-    @staticmethod
-    def __get_fake_user_agent() -> str:
-        """Имитирует запрос от браузера.
-
-        Returns:
-            Возвращает сымитированного юзер агента.
-        """
-        user_agent = UserAgent()
-        random_user_agent = user_agent.random
-        return random_user_agent
-
-    def __get_geolocation(self) -> tuple[float, float]:
+    def __get_geolocation(self, recheck: bool) -> tuple[float, float]:
         """Получает координаты города.
 
+        Args:
+            recheck: Не использовать кэш неизвестных городов.
+
         Returns:
             Возвращает широту и долготу.
         """
-        geolocator = Nominatim(user_agent=self.__get_fake_user_agent())
-        location = geolocator.geocode(self.__city)
-
-        if location is None:
-            error_message = 'Такого города не найдено!'
-            raise self.ArgumentError(error_message)
-
-        return location.latitude, location.longitude
+        return get_geolocation(self.__city, recheck)
 
     def set_current_params(self, params: list[str]) -> None:
         """Устанавливает требуемые параметры текущей погоды.
 
+        С сервера всегда запрашиваются все параметры из ALL_CURRENT_FIELDS,
+        поэтому здесь параметры проверяются и запоминаются для to_dict.
+
         Args:
             params: Параметры.
         """
+        unknown_params = [param for param in params
+                          if param not in ALL_CURRENT_FIELDS]
+
+        if unknown_params:
+            error_message = ('Неизвестные параметры: '
+                             f'{", ".join(unknown_params)}')
+            raise self.ArgumentError(error_message)
+
         self.__current_params = params
 
-    def request_weather(self) -> None:
-        """Получает и сохраняет ответ от сервера."""
-        for param in self.__current_params:
-            self.__params['current'].append(param)
+    def request_weather(self, timeout: float = FORECAST_TIMEOUT) -> None:
+        """Получает и сохраняет ответ от сервера.
 
-        response = requests.get(self.URL, params=self.__params)
+        Недавние ответы для той же ячейки координатной сетки берутся из
+        общего кэша FORECAST_CACHE.
 
-        if response.status_code != 200:
-            error_message = 'Не удалось получить ответ от сервера'
-            raise self.ServerError(error_message)
+        Args:
+            timeout: Бюджет времени на получение ответа в секундах.
+        """
+        self.__snapshot = FORECAST_CACHE.get_or_load(
+                self.__latitude,
+                self.__longitude,
+                FORECAST_PARAMS_KEY,
+                lambda latitude, longitude: fetch_forecasts(
+                        [(latitude, longitude)], timeout)[0],
+                )
+
+    @staticmethod
+    def request_many(
+            weathers: list[Weather],
+            timeout: float = FORECAST_TIMEOUT,
+            ) -> None:
+        """Получает и сохраняет ответы сервера для нескольких городов.
 
-        self.__last_result = response.json()
+        Прогнозы всех городов, которых нет в FORECAST_CACHE, запрашиваются
+        одним вызовом request_forecasts, а не по запросу на город.
+
+        Args:
+            weathers: Объекты Weather.
+            timeout: Бюджет времени на получение ответа в секундах.
+        """
+        snapshots = request_forecasts(
+                [(weather.__latitude, weather.__longitude)
+                 for weather in weathers],
+                timeout,
+                )
+
+        for weather, snapshot in zip(weathers, snapshots):
+            weather.__snapshot = snapshot
+
+    def to_dict(self) -> dict[str, Any]:
+        """Представляет последний ответ сервера в виде словаря.
+
+        Из текущей погоды остаются только параметры, заданные методом
+        set_current_params.
+
+        Returns:
+            Возвращает словарь, пригодный для сериализации в JSON.
+        """
+        result = self.__snapshot.to_dict()
+        current = result['current']
+        result['current'] = {
+            name: current[name]
+            for name in ['time', *self.__current_params]
+            if name in current
+            }
+        return {'city': self.__city, **result}
+
+    def get_snapshot(self) -> WeatherSnapshot:
+        """Получает снимок последнего ответа сервера.
+
+        Returns:
+            Возвращает неизменяемый снимок погоды.
+        """
+        return self.__snapshot
 
     def get_forecast(self) -> list[tuple[str, str, str, str]]:
         """Получает прогноз погоды.
@@ -150,12 +292,15 @@ class Weather:
         Returns:
             Возвращает прогноз погоды на ближайшие 3 дня.
         """
+        # Форматируются только показываемые дни, а не весь прогноз.
+        days = slice(1, 4)
+
         forecast = []
         for date, temperature_2m_min, temperature_2m_max, weather_code in zip(
-                self.__last_result['daily']['time'],
-                self.__last_result['daily']['temperature_2m_min'],
-                self.__last_result['daily']['temperature_2m_max'],
-                self.__last_result['daily']['weather_code'],
+                self.__snapshot.daily_time[days],
+                self.__snapshot.daily_temperature_2m_min[days],
+                self.__snapshot.daily_temperature_2m_max[days],
+                self.__snapshot.daily_weather_code[days],
                 ):
             day = self.__get_day(date)
             min_temp = str(round(temperature_2m_min))
@@ -163,7 +308,17 @@ class Weather:
             description = WEATHER_INTERPRETATION_CODES[weather_code]
             forecast.append((day, min_temp, max_temp, description))
 
-        return forecast[1:]
+        return forecast
+
+    def get_values(self) -> dict[tuple[str, int | None], float]:
+        """Получает числовые значения погодных переменных.
+
+        Returns:
+            Возвращает словарь, где ключ - пара (переменная, горизонт),
+            а горизонт равен None для текущих значений или номеру дня
+            прогноза (0 - сегодня).
+        """
+        return self.__snapshot.get_values()
 
     def get_day(self) -> str:
         """Получает текущую дату.
@@ -171,7 +326,7 @@ class Weather:
         Returns:
             Возвращает текущую дату.
         """
-        datetime = self.__last_result['current']['time']
+        datetime = self.__snapshot.time
         datetime = datetime.split('T')
 
         day = self.__get_day(datetime[0])
@@ -197,8 +352,8 @@ class Weather:
         Returns:
             Возвращет координаты города.
         """
-        latitude, longitude = (str(self.__last_result['latitude']),
-                               str(self.__last_result['longitude']))
+        latitude, longitude = (str(self.__snapshot.latitude),
+                               str(self.__snapshot.longitude))
         return latitude, longitude
 
     def get_temperature(self) -> str:
@@ -207,7 +362,7 @@ class Weather:
         Returns:
             Возвращет текущую температуру.
         """
-        temperature = round(self.__last_result['current']['temperature_2m'])
+        temperature = round(self.__snapshot.temperature_2m)
         return f'{temperature}°C'
 
     def get_relative_humidity(self) -> str:
@@ -216,8 +371,7 @@ class Weather:
         Returns:
             Возвращет текущую влажность.
         """
-        relative_humidity = (
-            self.__last_result['current']['relative_humidity_2m'])
+        relative_humidity = self.__snapshot.relative_humidity_2m
         return f'{relative_humidity}%'
 
     def get_apparent_temperature(self) -> str:
@@ -226,8 +380,7 @@ class Weather:
         Returns:
             Возвращает ощущаемую температуру.
         """
-        apparent_temperature = round(self.__last_result['current']
-                                     ['apparent_temperature'])
+        apparent_temperature = round(self.__snapshot.apparent_temperature)
         return f'{apparent_temperature}°C'
 
     def get_precipitation(self) -> str:
@@ -236,7 +389,7 @@ class Weather:
         Returns:
             Возвращает текущую влажность.
         """
-        precipitation = round(self.__last_result['current']['precipitation'])
+        precipitation = round(self.__snapshot.precipitation)
         return f'{precipitation} мм'
 
     def get_description(self) -> str:
@@ -245,7 +398,7 @@ class Weather:
         Returns:
             Возвращает погодные условия.
         """
-        weather_code = round(self.__last_result['current']['weather_code'])
+        weather_code = round(self.__snapshot.weather_code)
         description = WEATHER_INTERPRETATION_CODES[weather_code]
         return f'{description}'
 
@@ -255,7 +408,7 @@ class Weather:
         Returns:
             Возвращает текущее давление.
         """
-        pressure_in_hpa = self.__last_result['current']['pressure_msl']
+        pressure_in_hpa = self.__snapshot.pressure_msl
         pressure_in_mm = round(pressure_in_hpa * 0.7501)
         return f'{pressure_in_mm} мм рт. ст.'
 
@@ -265,7 +418,7 @@ class Weather:
         Returns:
             Возвращает текущую скорость ветра.
         """
-        wind_speed = self.__last_result['current']['wind_speed_10m']
+        wind_speed = self.__snapshot.wind_speed_10m
         return f'{wind_speed} м/с'
 
     def get_wind_direction(self) -> str:
@@ -274,7 +427,7 @@ class Weather:
         Returns:
             Возвращает направление ветра.
         """
-        wind_direction = self.__last_result['current']['wind_direction_10m']
+        wind_direction = self.__snapshot.wind_direction_10m
 
         if wind_direction >= 337.5 or wind_direction <= 22.5:
             return 'С'
@@ -299,3 +452,363 @@ class Weather:
 
         if 292.5 < wind_direction < 337.5:
             return 'СЗ'
+
+
+def get_fake_user_agent() -> str:
+    """Имитирует запрос от браузера.
+
+    Returns:
+        Возвращает сымитированного юзер агента.
+    """
+    user_agent = UserAgent()
+    random_user_agent = user_agent.random
+    return random_user_agent
+
+
+def get_geolocation(city: str, recheck: bool = False) -> tuple[float, float]:
+    """Получает координаты города с учётом ограничения частоты запросов.
+
+    Найденные координаты хранятся в общем кэше GEOCODE_CACHE, названия,
+    которые Nominatim не нашёл, - в кэше UNKNOWN_CITY_CACHE, и повторный
+    поиск такого названия сразу завершается ошибкой без запроса к
+    серверу. Ошибки сервера не кэшируются. Функцию можно вызывать из
+    нескольких потоков одновременно.
+
+    Args:
+        city: Название города.
+        recheck: Искать город у Nominatim, даже если недавно он не был
+            найден.
+
+    Returns:
+        Возвращает широту и долготу.
+    """
+    key = city.strip().lower()
+
+    # Кэш неизвестных городов обращается к базе данных, поэтому он
+    # проверяется только при промахе кэша найденных городов.
+    def load() -> tuple[float, float]:
+        if not recheck and UNKNOWN_CITY_CACHE.contains(key):
+            error_message = 'Такого города не найдено!'
+            raise Weather.ArgumentError(error_message)
+
+        try:
+            return _geocode(city)
+        except Weather.ArgumentError:
+            UNKNOWN_CITY_CACHE.add(key)
+            raise
+
+    location = GEOCODE_CACHE.get_or_load(key, load)
+
+    if recheck:
+        UNKNOWN_CITY_CACHE.discard(key)
+
+    return location
+
+
+def _geocode(city: str) -> tuple[float, float]:
+    """Запрашивает координаты города у Nominatim.
+
+    Args:
+        city: Название города.
+
+    Returns:
+        Возвращает широту и долготу.
+    """
+    geolocator = Nominatim(user_agent=get_fake_user_agent(),
+                           adapter_factory=TransportAdapter)
+
+    try:
+        location = geolocator.geocode(city, timeout=GEOCODE_TIMEOUT)
+    except GeopyError:
+        error_message = 'Не удалось получить ответ от сервера'
+        raise Weather.ServerError(error_message)
+
+    if location is None:
+        error_message = 'Такого города не найдено!'
+        raise Weather.ArgumentError(error_message)
+
+    return location.latitude, location.longitude
+
+
+def request_forecasts(
+        locations: list[tuple[float, float]],
+        timeout: float = FORECAST_TIMEOUT,
+        ) -> list[WeatherSnapshot]:
+    """Получает прогнозы для нескольких точек через общий кэш.
+
+    Прогнозы ячеек, которых нет в FORECAST_CACHE, запрашиваются одним
+    вызовом fetch_forecasts.
+
+    Args:
+        locations: Широты и долготы точек.
+        timeout: Бюджет времени на получение ответа в секундах.
+
+    Returns:
+        Возвращает снимки погоды в порядке точек.
+    """
+    return FORECAST_CACHE.get_or_load_many(
+            locations,
+            FORECAST_PARAMS_KEY,
+            lambda cells: fetch_forecasts(cells, timeout),
+            )
+
+
+def fetch_forecasts(
+        locations: list[tuple[float, float]],
+        timeout: float = FORECAST_TIMEOUT,
+        ) -> list[WeatherSnapshot]:
+    """Запрашивает прогнозы для нескольких точек по плану ENDPOINTS.
+
+    Все API из плана опрашиваются параллельно, по одному запросу на API
+    для всех точек, поэтому общее время равно времени самого медленного
+    ответа. Ответы объединяются в один снимок на точку. Если не ответил
+    дополнительный API, без значений остаются только его поля, а API
+    попадает в список unavailable снимка. Если у дополнительного API нет
+    данных для точки, например волнения вдали от моря, поля тоже
+    остаются пустыми, но API недоступным не считается.
+
+    Args:
+        locations: Широты и долготы точек.
+        timeout: Бюджет времени на получение ответа в секундах.
+
+    Returns:
+        Возвращает снимки погоды в порядке точек.
+    """
+    deadline = time.monotonic() + timeout
+    futures = {
+        endpoint.name: ENDPOINT_EXECUTOR.submit(
+                _fetch_source, endpoint, locations, deadline)
+        for endpoint in ENDPOINTS[1:]
+        }
+
+    # Основной запрос выполняется в текущем потоке, чтобы прогноз не ждал
+    # свободного потока общего пула.
+    results = _fetch_endpoint(ENDPOINTS[0], locations, timeout)
+
+    wait(futures.values(), timeout=max(0.0, deadline - time.monotonic()))
+
+    sources = {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            continue
+
+        try:
+            sources[name] = future.result()
+        except Weather.ServerError:
+            continue
+
+    snapshots = []
+    for index, result in enumerate(results):
+        current = dict(result.get('current', {}))
+        unavailable = []
+        for endpoint in ENDPOINTS[1:]:
+            if endpoint.name not in sources:
+                unavailable.append(endpoint.name)
+                continue
+
+            source = sources[endpoint.name][index] or {}
+            source_current = source.get('current', {})
+            for name in endpoint.params['current']:
+                current[name] = source_current.get(name)
+
+        snapshots.append(WeatherSnapshot.from_dict(
+                {**result, 'current': current, 'unavailable': unavailable}))
+
+    return snapshots
+
+
+def _fetch_source(
+        endpoint: Endpoint,
+        locations: list[tuple[float, float]],
+        deadline: float,
+        ) -> list[dict[str, Any] | None]:
+    """Запрашивает дополнительный API Open-Meteo для всех точек.
+
+    Точки, для которых у API недавно не было данных, не запрашиваются.
+
+    Args:
+        endpoint: Запрос из плана.
+        locations: Широты и долготы точек.
+        deadline: Момент по time.monotonic, до которого нужен ответ.
+
+    Returns:
+        Возвращает декодированные ответы в порядке точек, None для точек,
+        для которых у API нет данных.
+    """
+    indexes = [index for index, (latitude, longitude) in enumerate(locations)
+               if not NO_COVERAGE_CACHE.get((endpoint.name, latitude,
+                                             longitude), False)]
+
+    results = [None] * len(locations)
+    if indexes:
+        covered = _fetch_covered(endpoint,
+                                 [locations[index] for index in indexes],
+                                 deadline)
+        for index, result in zip(indexes, covered):
+            results[index] = result
+
+    return results
+
+
+def _fetch_covered(
+        endpoint: Endpoint,
+        locations: list[tuple[float, float]],
+        deadline: float,
+        ) -> list[dict[str, Any] | None]:
+    """Запрашивает дополнительный API, отделяя точки без данных.
+
+    Если API отказался отвечать для переданных координат, точки делятся
+    пополам и запрашиваются снова, пока не останутся отдельные точки без
+    данных. Такие точки запоминаются в NO_COVERAGE_CACHE. Поэтому одна
+    точка вне зоны покрытия не лишает данных остальные точки пачки, а
+    лишних запросов нет, пока все точки в зоне покрытия.
+
+    Args:
+        endpoint: Запрос из плана.
+        locations: Широты и долготы точек.
+        deadline: Момент по time.monotonic, до которого нужен ответ.
+
+    Returns:
+        Возвращает декодированные ответы в порядке точек, None для точек,
+        для которых у API нет данных.
+    """
+    timeout = deadline - time.monotonic()
+
+    if timeout <= 0:
+        error_message = 'Превышено время ожидания ответа'
+        raise Weather.ServerError(error_message)
+
+    try:
+        results = _fetch_endpoint(endpoint, locations, timeout)
+    except Weather.CoverageError:
+        if len(locations) == 1:
+            latitude, longitude = locations[0]
+            NO_COVERAGE_CACHE.set((endpoint.name, latitude, longitude), True)
+            return [None]
+
+        middle = len(locations) // 2
+        return (_fetch_covered(endpoint, locations[:middle], deadline)
+                + _fetch_covered(endpoint, locations[middle:], deadline))
+
+    return [None if result.get('error') else result for result in results]
+
+
+def _fetch_endpoint(
+        endpoint: Endpoint,
+        locations: list[tuple[float, float]],
+        timeout: float,
+        ) -> list[dict[str, Any]]:
+    """Запрашивает один API Open-Meteo для всех точек.
+
+    Args:
+        endpoint: Запрос из плана.
+        locations: Широты и долготы точек.
+        timeout: Бюджет времени на получение ответа в секундах.
+
+    Returns:
+        Возвращает декодированные ответы в порядке точек.
+    """
+    error_message = 'Не удалось получить ответ от сервера'
+    coordinates = {
+        'latitude': ','.join(str(latitude) for latitude, _ in locations),
+        'longitude': ','.join(str(longitude) for _, longitude in locations),
+        }
+
+    try:
+        response = TRANSPORT.get(endpoint.url,
+                                 params={**endpoint.params, **coordinates},
+                                 timeout=timeout)
+    except TransportError:
+        raise Weather.ServerError(error_message)
+
+    # Open-Meteo отвечает 400 и с причиной NO_COVERAGE_REASON, если точка
+    # вне зоны покрытия модели, и без неё - на некорректный запрос.
+    if response.status_code == 400 and _get_reason(response).startswith(
+            NO_COVERAGE_REASON):
+        raise Weather.CoverageError(error_message)
+
+    if response.status_code != 200:
+        raise Weather.ServerError(error_message)
+
+    # Для одной точки Open-Meteo возвращает объект, для нескольких - список.
+    results = response.json()
+    if isinstance(results, dict):
+        results = [results]
+
+    if len(results) != len(locations):
+        raise Weather.ServerError(error_message)
+
+    return results
+
+
+def _get_reason(response: TransportResponse) -> str:
+    """Получает причину ошибки из ответа Open-Meteo.
+
+    Args:
+        response: Ответ сервера.
+
+    Returns:
+        Возвращает причину или пустую строку, если её нет.
+    """
+    try:
+        reason = response.json().get('reason')
+    except (ValueError, AttributeError):
+        return ''
+
+    return reason if isinstance(reason, str) else ''
+
+
+def set_base_transport(transport: Transport,
+                       rate_limited: bool = True) -> None:
+    """Устанавливает транспорт, через который уходят все запросы Weather.
+
+    Поверх него строятся ограничение частоты запросов и дублирование
+    медленных запросов к Open-Meteo. Ограничение применяется снаружи
+    дублирования, поэтому ожидание очереди не считается задержкой
+    сервера при выборе момента дублирования, а дубль не ждёт в очереди;
+    доля дублей ограничена HedgedTransport. Подмена транспорта позволяет
+    записывать и воспроизводить обмен с внешними сервисами.
+
+    Args:
+        transport: Базовый транспорт.
+        rate_limited: Ограничивать ли частоту запросов.
+    """
+    global TRANSPORT, GEOCODE_TRANSPORT
+
+    geocode_transport = transport
+    forecast_transport = HedgedTransport(transport, timeout=FORECAST_TIMEOUT)
+    if rate_limited:
+        geocode_transport = RateLimitedTransport(transport,
+                                                 GEOCODE_RATE_LIMITER)
+        forecast_transport = RateLimitedTransport(forecast_transport,
+                                                  FORECAST_RATE_LIMITER)
+
+    GEOCODE_TRANSPORT = geocode_transport
+    TRANSPORT = forecast_transport
+
+
+class TransportAdapter(BaseSyncAdapter):
+    """Класс, направляющий запросы geopy через GEOCODE_TRANSPORT."""
+
+    def get_text(self, url: str, *, timeout: float,
+                 headers: dict[str, str]) -> str:
+        try:
+            response = GEOCODE_TRANSPORT.get(url, headers=headers,
+                                             timeout=timeout)
+        except TransportError as ex:
+            raise GeocoderServiceError(str(ex)) from ex
+
+        if response.status_code != 200:
+            error_message = f'Nominatim вернул код {response.status_code}'
+            raise GeocoderServiceError(error_message)
+
+        return response.content.decode('utf-8')
+
+    def get_json(self, url: str, *, timeout: float,
+                 headers: dict[str, str]) -> Any:
+        return json.loads(self.get_text(url, timeout=timeout,
+                                        headers=headers))
+
+
+set_base_transport(HttpTransport(SESSION))
@@ -1,12 +1,15 @@
+import argparse
+import json
 import sys
 
-from PyQt5 import QtWidgets
-
 from core.db import DataBase
-from windows.main_window import MainWindow
 
 
-def main() -> None:
+def run_gui() -> None:
+    from PyQt5 import QtWidgets
+
+    from windows.main_window import MainWindow
+
     app = QtWidgets.QApplication([])
     database = DataBase()
     window = MainWindow(database)
@@ -14,5 +17,243 @@ def main() -> None:
     sys.exit(app.exec_())
 
 
+def run_import(args: argparse.Namespace) -> None:
+    from core.favourites import CityFileError, import_favourite_cities
+
+    try:
+        report = import_favourite_cities(DataBase(), args.path,
+                                         workers=args.workers)
+    except CityFileError as ex:
+        sys.exit(str(ex))
+
+    for row_number, name, reason in report.failures:
+        print(f'Строка {row_number}: <<{name}>> - {reason}', file=sys.stderr)
+
+    print(f'Импортировано городов: {len(report.imported)}, '
+          f'ошибок: {len(report.failures)}')
+
+
+def run_export(args: argparse.Namespace) -> None:
+    from core.favourites import export_favourite_cities
+
+    count = export_favourite_cities(DataBase(), args.path)
+    print(f'Выгружено городов: {count}')
+
+
+def run_serve(args: argparse.Namespace) -> None:
+    from core.service import serve
+
+    serve(args.host, args.port)
+
+
+def run_fetch(args: argparse.Namespace) -> None:
+    from core.favourites import CityFileError, read_city_names
+    from core.replay import fetch_cities
+
+    try:
+        cities = [name for _, name, error in read_city_names(args.path)
+                  if name and error is None]
+    except CityFileError as ex:
+        sys.exit(str(ex))
+
+    print(json.dumps(fetch_cities(cities, workers=args.workers)))
+
+
+def run_bench(args: argparse.Namespace) -> None:
+    from core.replay import run_trace
+
+    print(json.dumps(run_trace(args.archive, timing=args.timing,
+                               workers=args.workers)))
+
+
+def run_warm(args: argparse.Namespace) -> None:
+    from core.warmer import run_daemon, warm
+
+    def report(progress) -> None:
+        print(f'Шард {progress.shard}: {progress.done}/{progress.total}, '
+              f'ошибок {progress.failed}, отставание {progress.lag:.1f} с')
+
+        if progress.error is not None:
+            print(f'Шард {progress.shard}: {progress.error}')
+
+    if args.once:
+        warm(processes=args.processes, batch_size=args.batch_size,
+             report=report, replay_path=args.replay,
+             replay_timing=args.replay_timing)
+        return
+
+    run_daemon(processes=args.processes, interval=args.interval,
+               batch_size=args.batch_size, report=report,
+               replay_path=args.replay, replay_timing=args.replay_timing)
+
+
+def run_export_history(args: argparse.Namespace) -> None:
+    from core.history import export_history
+
+    count = export_history(DataBase(), args.directory, format=args.format,
+                           incremental=not args.full)
+    print(f'Выгружено строк истории: {count}')
+
+
+def run_alerts_add(args: argparse.Namespace) -> None:
+    import sqlite3
+
+    from core.alerts import RuleError, parse_condition, save_alert_rule
+
+    try:
+        conditions = [parse_condition(parts) for parts in args.condition]
+        save_alert_rule(DataBase(), args.name, args.phrase, conditions)
+    except RuleError as ex:
+        sys.exit(str(ex))
+    except sqlite3.IntegrityError:
+        sys.exit(f'Правило <<{args.name}>> уже существует')
+
+    print(f'Правило <<{args.name}>> добавлено')
+
+
+def run_alerts_list(args: argparse.Namespace) -> None:
+    from core.alerts import load_alert_rules
+
+    for rule in load_alert_rules(DataBase()):
+        conditions = ' и '.join(
+                f'{condition.variable} {condition.operator} '
+                f'{condition.value:g}'
+                + ('' if condition.horizon is None
+                   else f' (день {condition.horizon})')
+                for condition in rule.conditions)
+        print(f'{rule.name}: {conditions} - {rule.phrase}')
+
+
+def run_alerts_delete(args: argparse.Namespace) -> None:
+    from core.alerts import load_alert_rules
+
+    database = DataBase()
+
+    if args.name not in {rule.name for rule in load_alert_rules(database)}:
+        sys.exit(f'Правило <<{args.name}>> не найдено')
+
+    database.delete_alert_rule(args.name)
+    print(f'Правило <<{args.name}>> удалено')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Прогноз погоды')
+    parser.add_argument('--record', metavar='ARCHIVE',
+                        help='записать запросы к Nominatim и Open-Meteo')
+    parser.add_argument('--replay', metavar='ARCHIVE',
+                        help='отвечать на запросы из записанного архива')
+    parser.add_argument('--replay-timing', action='store_true',
+                        help='воспроизводить записанные задержки')
+    subparsers = parser.add_subparsers(dest='command')
+
+    import_parser = subparsers.add_parser(
+            'import', help='импорт любимых городов из CSV или JSON')
+    import_parser.add_argument('path')
+    import_parser.add_argument('--workers', type=int, default=4)
+    import_parser.set_defaults(handler=run_import)
+
+    export_parser = subparsers.add_parser(
+            'export', help='выгрузка любимых городов в CSV или JSON')
+    export_parser.add_argument('path')
+    export_parser.set_defaults(handler=run_export)
+
+    serve_parser = subparsers.add_parser(
+            'serve', help='HTTP сервис с общим кэшем погоды')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.set_defaults(handler=run_serve)
+
+    fetch_parser = subparsers.add_parser(
+            'fetch', help='получить погоду для городов из CSV или JSON')
+    fetch_parser.add_argument('path')
+    fetch_parser.add_argument('--workers', type=int, default=8)
+    fetch_parser.set_defaults(handler=run_fetch)
+
+    bench_parser = subparsers.add_parser(
+            'bench', help='воспроизвести записанную нагрузку без сети')
+    bench_parser.add_argument('archive')
+    bench_parser.add_argument('--timing', action='store_true',
+                              help='воспроизводить записанные задержки')
+    bench_parser.add_argument('--workers', type=int, default=8)
+    bench_parser.set_defaults(handler=run_bench)
+
+    warm_parser = subparsers.add_parser(
+            'warm', help='фоновое обновление кэша прогнозов')
+    warm_parser.add_argument('--once', action='store_true',
+                             help='обновить один раз и выйти')
+    warm_parser.add_argument('--processes', type=int, default=None)
+    warm_parser.add_argument('--interval', type=float, default=50 * 60)
+    warm_parser.add_argument('--batch-size', type=int, default=50)
+    warm_parser.set_defaults(handler=run_warm)
+
+    export_history_parser = subparsers.add_parser(
+            'export-history', help='выгрузка истории погоды по столбцам')
+    export_history_parser.add_argument('directory')
+    export_history_parser.add_argument(
+            '--format', choices=('arrow', 'parquet', 'binary'),
+            help='по умолчанию arrow, если установлен pyarrow, иначе binary')
+    export_history_parser.add_argument(
+            '--full', action='store_true',
+            help='выгрузить всю историю в новый каталог')
+    export_history_parser.set_defaults(handler=run_export_history)
+
+    alerts_parser = subparsers.add_parser(
+            'alerts', help='правила оповещений для любимых городов')
+    alerts_subparsers = alerts_parser.add_subparsers(dest='alerts_command',
+                                                     required=True)
+
+    alerts_add_parser = alerts_subparsers.add_parser(
+            'add', help='добавить правило')
+    alerts_add_parser.add_argument('name')
+    alerts_add_parser.add_argument('phrase')
+    alerts_add_parser.add_argument(
+            '--condition', action='append', nargs='+', required=True,
+            metavar='ARG',
+            help='ПЕРЕМЕННАЯ ОПЕРАТОР ЗНАЧЕНИЕ [ДЕНЬ], например '
+                 'temperature_2m_max ">=" 30 1; все условия правила '
+                 'должны выполняться одновременно')
+    alerts_add_parser.set_defaults(handler=run_alerts_add)
+
+    alerts_list_parser = alerts_subparsers.add_parser(
+            'list', help='показать правила')
+    alerts_list_parser.set_defaults(handler=run_alerts_list)
+
+    alerts_delete_parser = alerts_subparsers.add_parser(
+            'delete', help='удалить правило')
+    alerts_delete_parser.add_argument('name')
+    alerts_delete_parser.set_defaults(handler=run_alerts_delete)
+
+    args = parser.parse_args()
+
+    if args.command == 'warm' and args.record:
+        parser.error('--record не поддерживается командой warm: запросы '
+                     'выполняются в нескольких процессах')
+
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    recorder = None
+
+    if args.record:
+        from core.replay import record
+
+        recorder = record(args.record)
+    elif args.replay:
+        from core.replay import replay
+
+        replay(args.replay, timing=args.replay_timing)
+
+    try:
+        if args.command is None:
+            run_gui()
+        else:
+            args.handler(args)
+    finally:
+        if recorder is not None:
+            recorder.close()
+
+
 if __name__ == '__main__':
     main()
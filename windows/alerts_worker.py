@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import sqlite3
+from collections.abc import Mapping
+
+from PyQt5 import QtCore
+
+from core.alerts import check_favourite_alerts
+from core.db import DataBase
+
+
+class AlertsWorker(QtCore.QThread):
+    alerts_found = QtCore.pyqtSignal(list)
+
+    def __init__(
+            self,
+            values: Mapping[str, Mapping[tuple[str, int | None], float]],
+            parent: QtCore.QObject | None = None,
+            ):
+        super().__init__(parent)
+        self.__values = values
+
+    def run(self) -> None:
+        # Соединение с SQLite нельзя использовать из другого потока,
+        # поэтому у потока своё соединение.
+        database = DataBase()
+
+        try:
+            alerts = check_favourite_alerts(
+                    database,
+                    self.__values,
+                    should_stop=self.isInterruptionRequested,
+                    )
+        except sqlite3.Error:
+            return
+
+        if alerts and not self.isInterruptionRequested():
+            self.alerts_found.emit(alerts)
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import datetime
+from collections.abc import Mapping
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from core.chart import (ChartPanel, get_daily_panels, get_hourly_panels,
+                        lttb)
+from core.snapshot import WeatherSnapshot
+
+COLORS = (
+    '#1f77b4',
+    '#d62728',
+    '#2ca02c',
+    '#ff7f0e',
+    '#9467bd',
+    '#8c564b',
+    '#e377c2',
+    '#17becf',
+    )
+
+MARGIN_LEFT = 60
+MARGIN_RIGHT = 16
+TITLE_HEIGHT = 22
+AXIS_HEIGHT = 20
+MAX_CACHED_WIDTHS = 32
+
+
+class ChartCanvas(QtWidgets.QWidget):
+    def __init__(self, parent: QtWidgets.QWidget | None = None):
+        super().__init__(parent)
+        self.setMinimumHeight(360)
+        self.__panels: list[ChartPanel] = []
+        self.__ranges: list[tuple[float, float, float, float]] = []
+        # Прореженные ряды по ширине графика: при изменении высоты окна
+        # и при перерисовке LTTB не пересчитывается.
+        self.__samples: dict[int, list[list[tuple[list[float],
+                                                  list[float]]]]] = {}
+        # Готовые ломаные для текущего размера виджета.
+        self.__polygons_size: QtCore.QSize | None = None
+        self.__polygons: list[list[QtGui.QPolygonF]] = []
+
+    def set_panels(self, panels: list[ChartPanel]) -> None:
+        self.__panels = panels
+        self.__ranges = [self.__get_range(panel) for panel in panels]
+        self.__samples.clear()
+        self.__polygons_size = None
+        self.update()
+
+    def paintEvent(self, a0: QtGui.QPaintEvent) -> None:
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), QtCore.Qt.white)
+
+        if not self.__panels:
+            return
+
+        polygons = self.__get_polygons()
+        for index, panel in enumerate(self.__panels):
+            rect = self.__get_plot_rect(index)
+            self.__draw_frame(painter, rect, panel, self.__ranges[index])
+
+            painter.setRenderHint(QtGui.QPainter.Antialiasing)
+            for line_index, polygon in enumerate(polygons[index]):
+                color = QtGui.QColor(COLORS[line_index % len(COLORS)])
+                painter.setPen(QtGui.QPen(color, 1.5))
+                painter.drawPolyline(polygon)
+            painter.setRenderHint(QtGui.QPainter.Antialiasing, False)
+
+        self.__draw_legend(painter)
+
+    @staticmethod
+    def __get_range(panel: ChartPanel) -> tuple[float, float, float, float]:
+        xs = [x for line in panel.lines for x in (line.xs[:1] + line.xs[-1:])]
+        ys = [min(line.ys) for line in panel.lines if line.ys]
+        ys += [max(line.ys) for line in panel.lines if line.ys]
+
+        if not xs or not ys:
+            return 0.0, 1.0, 0.0, 1.0
+
+        x_min, x_max = min(xs), max(xs)
+        y_min, y_max = min(ys), max(ys)
+
+        if x_min == x_max:
+            x_max = x_min + 1.0
+
+        if y_min == y_max:
+            y_min, y_max = y_min - 1.0, y_max + 1.0
+
+        return x_min, x_max, y_min, y_max
+
+    def __get_plot_rect(self, index: int) -> QtCore.QRectF:
+        panel_height = self.height() / len(self.__panels)
+        top = index * panel_height + TITLE_HEIGHT
+        return QtCore.QRectF(
+                MARGIN_LEFT,
+                top,
+                max(1.0, self.width() - MARGIN_LEFT - MARGIN_RIGHT),
+                max(1.0, panel_height - TITLE_HEIGHT - AXIS_HEIGHT),
+                )
+
+    def __get_samples(
+            self,
+            width: int,
+            ) -> list[list[tuple[list[float], list[float]]]]:
+        samples = self.__samples.get(width)
+
+        if samples is not None:
+            return samples
+
+        if len(self.__samples) >= MAX_CACHED_WIDTHS:
+            self.__samples.clear()
+
+        samples = []
+        for panel in self.__panels:
+            panel_samples = []
+            for line in panel.lines:
+                indexes = lttb(line.xs, line.ys, width)
+                panel_samples.append(([line.xs[i] for i in indexes],
+                                      [line.ys[i] for i in indexes]))
+            samples.append(panel_samples)
+
+        self.__samples[width] = samples
+        return samples
+
+    def __get_polygons(self) -> list[list[QtGui.QPolygonF]]:
+        if self.__polygons_size == self.size():
+            return self.__polygons
+
+        width = int(self.__get_plot_rect(0).width())
+        samples = self.__get_samples(width)
+
+        polygons = []
+        for index, panel_samples in enumerate(samples):
+            rect = self.__get_plot_rect(index)
+            x_min, x_max, y_min, y_max = self.__ranges[index]
+            x_scale = rect.width() / (x_max - x_min)
+            y_scale = rect.height() / (y_max - y_min)
+
+            panel_polygons = []
+            for xs, ys in panel_samples:
+                panel_polygons.append(QtGui.QPolygonF([
+                    QtCore.QPointF(rect.left() + (x - x_min) * x_scale,
+                                   rect.bottom() - (y - y_min) * y_scale)
+                    for x, y in zip(xs, ys)
+                    ]))
+            polygons.append(panel_polygons)
+
+        self.__polygons = polygons
+        self.__polygons_size = self.size()
+        return polygons
+
+    def __draw_frame(
+            self,
+            painter: QtGui.QPainter,
+            rect: QtCore.QRectF,
+            panel: ChartPanel,
+            value_range: tuple[float, float, float, float],
+            ) -> None:
+        x_min, x_max, y_min, y_max = value_range
+        metrics = painter.fontMetrics()
+
+        painter.setPen(QtGui.QColor('#202020'))
+        painter.drawText(
+                QtCore.QPointF(rect.left(), rect.top() - 6),
+                f'{panel.title}, {panel.unit}',
+                )
+
+        painter.setPen(QtGui.QColor('#c0c0c0'))
+        painter.drawRect(rect)
+
+        painter.setPen(QtGui.QColor('#606060'))
+        for value, y in ((y_max, rect.top() + metrics.ascent()),
+                         (y_min, rect.bottom())):
+            text = f'{value:.1f}'
+            painter.drawText(
+                    QtCore.QPointF(rect.left() - metrics.width(text) - 6, y),
+                    text,
+                    )
+
+        day = 24 * 60 * 60
+        days = int((x_max - x_min) // day) + 1
+        step = max(1, days * 50 // max(1, int(rect.width())) + 1)
+        x_scale = rect.width() / (x_max - x_min)
+
+        first_day = -(-x_min // day) * day
+        for number, x in enumerate(range(int(first_day), int(x_max) + 1,
+                                         day)):
+            if number % step:
+                continue
+
+            position = rect.left() + (x - x_min) * x_scale
+            painter.setPen(QtGui.QColor('#e8e8e8'))
+            painter.drawLine(QtCore.QPointF(position, rect.top()),
+                             QtCore.QPointF(position, rect.bottom()))
+
+            date = datetime.datetime.fromtimestamp(x, datetime.timezone.utc)
+            painter.setPen(QtGui.QColor('#606060'))
+            painter.drawText(
+                    QtCore.QPointF(position + 2,
+                                   rect.bottom() + metrics.ascent() + 2),
+                    date.strftime('%d.%m'),
+                    )
+
+    def __draw_legend(self, painter: QtGui.QPainter) -> None:
+        metrics = painter.fontMetrics()
+        right = self.width() - MARGIN_RIGHT
+
+        for panel_index, panel in enumerate(self.__panels):
+            if len(panel.lines) < 2:
+                continue
+
+            rect = self.__get_plot_rect(panel_index)
+            for line_index, line in reversed(list(enumerate(panel.lines))):
+                right -= metrics.width(line.label)
+                painter.setPen(QtGui.QColor(COLORS[line_index % len(COLORS)]))
+                painter.drawText(QtCore.QPointF(right, rect.top() - 6),
+                                 line.label)
+                right -= 12
+
+            right = self.width() - MARGIN_RIGHT
+
+
+class ForecastChartWidget(QtWidgets.QWidget):
+    def __init__(self, parent: QtWidgets.QWidget | None = None):
+        super().__init__(parent)
+        self.__snapshots: Mapping[str, WeatherSnapshot] = {}
+        self.__panels: dict[int, list[ChartPanel]] = {}
+
+        self.mode_combo = QtWidgets.QComboBox()
+        self.mode_combo.addItems(['По часам', 'На 16 дней'])
+        self.mode_combo.currentIndexChanged.connect(self.on_mode_change)
+
+        self.canvas = ChartCanvas()
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.mode_combo, 0, QtCore.Qt.AlignLeft)
+        layout.addWidget(self.canvas, 1)
+
+    def set_snapshots(self, snapshots: Mapping[str, WeatherSnapshot]) -> None:
+        self.__snapshots = snapshots
+        self.__panels.clear()
+        self.on_mode_change()
+
+    def on_mode_change(self) -> None:
+        mode = self.mode_combo.currentIndex()
+
+        if mode not in self.__panels:
+            if mode == 0:
+                self.__panels[mode] = get_hourly_panels(self.__snapshots)
+            else:
+                self.__panels[mode] = get_daily_panels(self.__snapshots)
+
+        self.canvas.set_panels(self.__panels[mode])
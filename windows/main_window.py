@@ -4,9 +4,13 @@ import sqlite3
 
 from PyQt5 import QtWidgets
 
+from core.alerts import Alert
 from core.db import DataBase
-from core.weather import WEATHER_INTERPRETATION_CODES, Weather
+from core.weather import (WEATHER_INTERPRETATION_CODES, Weather,
+                          get_geolocation)
 from ui.ui_compiled.ui_weather import Ui_MainWindow
+from windows.alerts_worker import AlertsWorker
+from windows.chart_widget import ForecastChartWidget
 from windows.messages import MessageBox
 from windows.show_models import DataTableViewModel
 
@@ -16,6 +20,8 @@ class MainWindow(QtWidgets.QMainWindow):
         super().__init__()
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
+        self.chart_widget = ForecastChartWidget()
+        self.ui.tabs.addTab(self.chart_widget, 'Графики')
 
         self.__database = database
         self.base_current_weather_params = [
@@ -26,6 +32,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.__weather: Weather | None = None
         self.__favourite_weather_description: str | None = None
         self.__favourite_weather_phrase: str | None = None
+        self.__alerts_worker: AlertsWorker | None = None
 
         self.ui.city_combo.currentIndexChanged.connect(
                 self.on_city_combo_change)
@@ -58,8 +65,8 @@ class MainWindow(QtWidgets.QMainWindow):
         favourite_city = self.ui.city_text.text().strip()
 
         try:
-            _ = Weather(favourite_city)
-        except Weather.ArgumentError as ex:
+            latitude, longitude = get_geolocation(favourite_city)
+        except (Weather.ArgumentError, Weather.ServerError) as ex:
             MessageBox.show_warning_message(
                     title='Не удалось добавить город в любимые',
                     text=str(ex),
@@ -75,6 +82,8 @@ class MainWindow(QtWidgets.QMainWindow):
                     )
             return
 
+        self.__database.add_city_locations(
+                [(favourite_city, latitude, longitude)])
         MessageBox.show_information_message(
                 title='Сохранено',
                 text=f'Город <<{favourite_city}>> добавлен в любимые',
@@ -91,7 +100,7 @@ class MainWindow(QtWidgets.QMainWindow):
         city = self.ui.city_text.text().strip()
         try:
             self.__weather = Weather(city)
-        except Weather.ArgumentError as ex:
+        except (Weather.ArgumentError, Weather.ServerError) as ex:
             MessageBox.show_warning_message(
                     title='Ошибка',
                     text=str(ex),
@@ -118,8 +127,28 @@ class MainWindow(QtWidgets.QMainWindow):
                     title='Сообщение',
                     text=self.__favourite_weather_phrase,
                     )
+
+        self.check_alerts()
+
+    def check_alerts(self) -> None:
+        if self.__alerts_worker is not None and (
+                self.__alerts_worker.isRunning()):
             return
 
+        self.__alerts_worker = AlertsWorker(
+                {self.__weather.get_city(): self.__weather.get_values()},
+                self,
+                )
+        self.__alerts_worker.alerts_found.connect(self.on_alerts_found)
+        self.__alerts_worker.start()
+
+    def on_alerts_found(self, alerts: list[Alert]) -> None:
+        MessageBox.show_information_message(
+                title='Оповещения',
+                text='\n'.join(f'{alert.city}: {alert.rule.phrase}'
+                               for alert in alerts),
+                )
+
     def __get_weather_params(self) -> list[str]:
         params = []
         params += self.base_current_weather_params
@@ -144,6 +173,7 @@ class MainWindow(QtWidgets.QMainWindow):
     def show_weather(self) -> None:
         self.show_current_weather()
         self.show_weather_forecast()
+        self.show_weather_chart()
 
     def show_current_weather(self) -> None:
         headers = [
@@ -206,6 +236,10 @@ class MainWindow(QtWidgets.QMainWindow):
             table.setColumnWidth(0, 400)
             table.show()
 
+    def show_weather_chart(self) -> None:
+        self.chart_widget.set_snapshots(
+                {self.__weather.get_city(): self.__weather.get_snapshot()})
+
     def on_save_favourite_weather(self) -> None:
         if not self.ui.favourite_weather_message.text().strip():
             MessageBox.show_warning_message(
@@ -247,6 +281,12 @@ class MainWindow(QtWidgets.QMainWindow):
                 self.__favourite_weather_phrase)
 
     def closeEvent(self, a0):
+        if self.__alerts_worker is not None:
+            # Поток прекращает работу после текущего запроса, поэтому
+            # закрытие окна не ждёт проверки всех любимых городов.
+            self.__alerts_worker.requestInterruption()
+            self.__alerts_worker.wait()
+
         if not self.__weather:
             return
 